@@ -0,0 +1,108 @@
+"""bench_models.py - Micro-benchmarks of the model classes.
+
+Run from the scraper directory:
+
+    python -m benchmarks.bench_models --output results.json
+
+Compares reading attributes of the slotted models with the ReadOnly.__getattr__
+fallback that dict-based subclasses still use, and the memory of both layouts:
+the instance alone and its deep size with every attribute value (strings, days,
+masks and digest) included.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+from rpi_courses.models import Period, ReadOnly
+from benchmarks.synthetic import make_catalog
+
+
+class DictPeriod(ReadOnly):
+    "A period stored in an instance __dict__, which reads through ReadOnly.__getattr__."
+    def __init__(self, period):
+        for name in Period.__slots__:
+            if not name.startswith('__'):
+                setattr(self, name, getattr(period, name))
+
+
+def access_seconds(obj, number):
+    "Returns the seconds of reading start, end and int_days number times."
+    return min(timeit.repeat(
+        'obj.start; obj.end; obj.int_days', globals={'obj': obj}, number=number, repeat=5,
+    ))
+
+
+def instance_bytes(obj):
+    "Returns the size of the instance itself and its __dict__, without the attribute values."
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def deep_bytes(obj):
+    """Returns instance_bytes plus the size of every attribute value, going into tuples.
+    Values that are shared with other instances (like interned strings and cached
+    minute masks) are counted in full.
+    """
+    if hasattr(obj, '__dict__'):
+        values = list(obj.__dict__.values())
+    else:
+        values = [getattr(obj, name) for name in Period.__slots__ if hasattr(obj, name)]
+    size, seen = instance_bytes(obj), set()
+    while values:
+        value = values.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if isinstance(value, tuple):
+            values.extend(value)
+    return size
+
+
+def run(number=200000, periods=50000):
+    period = make_catalog(courses=1, sections=(1, 1), periods=(1, 1), tba_ratio=0)[0].sections[0].periods[0]
+    slotted = access_seconds(period, number)
+    trampoline = access_seconds(DictPeriod(period), number)
+    slotted_bytes, dict_bytes = instance_bytes(period), instance_bytes(DictPeriod(period))
+    slotted_deep, dict_deep = deep_bytes(period), deep_bytes(DictPeriod(period))
+    return dict(
+        attribute_reads=number * 3,
+        slotted_seconds=slotted,
+        getattr_seconds=trampoline,
+        speedup=trampoline / slotted,
+        period_bytes=slotted_bytes,
+        dict_period_bytes=dict_bytes,
+        period_deep_bytes=slotted_deep,
+        dict_period_deep_bytes=dict_deep,
+        periods=periods,
+        saved_bytes=(dict_bytes - slotted_bytes) * periods,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=200000, help="attribute reads per run, per attribute")
+    parser.add_argument('--periods', type=int, default=50000, help="catalog size to estimate the memory saved for")
+    parser.add_argument('--output', help="file to write the JSON results to (default: stdout)")
+    args = parser.parse_args(argv)
+    report = dict(
+        benchmark='models',
+        python=platform.python_version(),
+        platform=platform.platform(),
+        options=vars(args),
+        results=run(args.number, args.periods),
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""bench_scheduler.py - Times rpi_courses.scheduler on synthetic catalogs.
+
+Run from the scraper directory:
+
+    python -m benchmarks.bench_scheduler --output results.json
+
+For every course-set size, it records the number of schedules, the best time of
+compute_schedules building the full list, the best time of consuming the
+return_generator=True generator, the best time of paging through all the
+schedules and exporting them as JSON Lines, and the peak memory of building
+the list. With --linked-sections, lectures and labs are scheduled together as
+SectionGroups.
+Results are written as JSON so runs can be compared over time.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from rpi_courses.scheduler import Scheduler, compute_schedules, schedules_to_jsonl
+from benchmarks.synthetic import make_catalog
+
+
+def best_time(func, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(func):
+    "Returns the peak memory allocated while calling func, in bytes."
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, repeat=3, backend=None, linked_sections=False, page_size=100, **catalog_options):
+    catalog = make_catalog(courses=max(sizes), **catalog_options)
+    results = []
+    for size in sizes:
+        courses = catalog[:size]
+
+        def build_list():
+            return compute_schedules(courses, backend=backend, linked_sections=linked_sections)
+
+        def consume_generator():
+            count = 0
+            for schedule in compute_schedules(courses, backend=backend, return_generator=True, linked_sections=linked_sections):
+                count += 1
+            return count
+
+        def page_and_export():
+            scheduler = Scheduler(linked_sections=linked_sections)
+            length, cursor = 0, None
+            while True:
+                schedules, cursor = scheduler.page_schedules(courses, page_size, cursor)
+                for line in schedules_to_jsonl(schedules, cursor):
+                    length += len(line)
+                if cursor is None:
+                    return length
+
+        results.append(dict(
+            courses=size,
+            sections=sum(len(c.sections) for c in courses),
+            schedules=consume_generator(),
+            list_seconds=best_time(build_list, repeat),
+            generator_seconds=best_time(consume_generator, repeat),
+            paged_seconds=best_time(page_and_export, repeat) if backend != 'pyconstraints' else None,
+            list_peak_bytes=peak_memory(build_list),
+        ))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='2-8', help="course-set sizes, as 'min-max' (default: 2-8)")
+    parser.add_argument('--sections', default='4-12', help="sections per course, as 'min-max' (default: 4-12)")
+    parser.add_argument('--periods', default='1-3', help="periods per section, as 'min-max' (default: 1-3)")
+    parser.add_argument('--tba-ratio', type=float, default=0.05)
+    parser.add_argument('--full-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backend', choices=('native', 'pyconstraints'), default=None)
+    parser.add_argument('--linked-sections', action='store_true',
+                        help="schedule lectures and labs together as SectionGroups")
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--output', help="file to write the JSON results to (default: stdout)")
+    args = parser.parse_args(argv)
+
+    def span(value):
+        low, _, high = value.partition('-')
+        return int(low), int(high or low)
+
+    low, high = span(args.sizes)
+    report = dict(
+        benchmark='scheduler',
+        date=datetime.datetime.now().isoformat(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        options=vars(args),
+        results=run(
+            list(range(low, high + 1)), args.repeat, args.backend, args.linked_sections, args.page_size,
+            sections=span(args.sections), periods=span(args.periods),
+            tba_ratio=args.tba_ratio, full_ratio=args.full_ratio, seed=args.seed,
+        ),
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""synthetic.py - Generates synthetic course catalogs for the benchmarks.
+
+The catalogs use the same models as the parsers, with meeting times drawn from
+the usual RPI time blocks, so they exercise the same code paths as real data.
+"""
+import random
+
+from rpi_courses.models import Course, Period, Section
+
+
+# (days, start, end) blocks that classes usually meet in
+TIME_BLOCKS = [
+    (days, start, start + length)
+    for days in ([0, 3], [1, 4], [0, 2, 3], [1, 3], [2], [4])
+    for start in (800, 900, 1000, 1100, 1200, 1400, 1500, 1600, 1800)
+    for length in (50, 150)
+]
+PERIOD_TYPES = ('LEC', 'LEC', 'LAB', 'REC', 'STU')
+
+
+def make_period(rand, tba_ratio):
+    if rand.random() < tba_ratio:
+        return Period('LEC', 'Staff', '** TBA **', '** TBA **', 'TBA', [])
+    days, start, end = rand.choice(TIME_BLOCKS)
+    return Period(
+        rand.choice(PERIOD_TYPES), 'Instructor %d' % rand.randint(1, 50),
+        start, end, 'DCC %d' % rand.randint(300, 340), days,
+    )
+
+
+def make_catalog(courses=8, sections=(4, 12), periods=(1, 3), tba_ratio=0.05, full_ratio=0.1, seed=0):
+    """Returns a list of synthetic courses.
+
+    ``sections``: (min, max) number of sections of each course.
+    ``periods``: (min, max) number of periods of each section.
+    ``tba_ratio``: The fraction of periods with TBA times.
+    ``full_ratio``: The fraction of sections without seats left.
+    """
+    rand = random.Random(seed)
+    crn = 10000
+    catalog = []
+    for i in range(courses):
+        course_sections = []
+        for num in range(1, rand.randint(*sections) + 1):
+            crn += 1
+            total = rand.randint(10, 200)
+            taken = total if rand.random() < full_ratio else rand.randint(0, total - 1)
+            course_sections.append(Section(
+                crn, '%02d' % num, taken, total,
+                [make_period(rand, tba_ratio) for p in range(rand.randint(*periods))], [],
+            ))
+        catalog.append(Course(
+            'Synthetic Course %d' % i, 'SYNT', str(1000 + i), 4, 4, 'Normal', course_sections,
+        ))
+    return catalog
@@ -0,0 +1,131 @@
+"""batch.py - Schedules many course sets at once, sharing work between them.
+
+Course sets of different students overlap a lot, so every course is compiled
+only once: its unary-filtered sections, its equivalence classes and, for custom
+constraints, the results of comparing its sections with other sections.
+"""
+import operator
+
+from rpi_courses.scheduler import Scheduler
+from rpi_courses.solver import ConflictCache, SectionSolver
+
+
+__all__ = ['BatchScheduler', 'schedule_batch']
+
+
+class BatchScheduler(Scheduler):
+    """A Scheduler that caches compiled courses and section-pair conflicts across
+    all of its queries. Takes the same arguments as Scheduler.
+
+    The default constraint is already one AND of minute bitmasks per shared day, which
+    is cheaper than a cache lookup, so only custom constraints use the conflict cache.
+    """
+    def __init__(self, *args, **kwargs):
+        super(BatchScheduler, self).__init__(*args, **kwargs)
+        self.conflicts = ConflictCache(self.section_constraint)
+        self._compiled = {}
+        self._settings = None
+        self.course_hits = self.course_misses = 0
+
+    def schedule_batch(self, course_sets, count=False):
+        """Returns the schedules of each of the given course sets, in order.
+
+        ``count``: If True, returns the number of schedules of each set instead of
+            a generator of them.
+        """
+        if count:
+            return [self.count_schedules(courses) for courses in course_sets]
+        return [self.find_schedules(courses, return_generator=True) for courses in course_sets]
+
+    def cache_stats(self):
+        "Returns the hits, misses and hit rates of the course and conflict caches."
+        calls = self.course_hits + self.course_misses
+        return dict(
+            course_hits=self.course_hits,
+            course_misses=self.course_misses,
+            course_hit_rate=self.course_hits / calls if calls else 0.0,
+            conflict_hits=self.conflicts.hits,
+            conflict_misses=self.conflicts.misses,
+            conflict_hit_rate=self.conflicts.hit_rate,
+        )
+
+    def forget_courses(self, courses):
+        """Drops the compiled sections of the given courses, e.g. after their seats were
+        updated. Everything else in the caches stays valid.
+        """
+        for course in courses:
+            course.clear_cache()
+            self._compiled.pop(id(course), None)
+        return self
+
+    def clear_cache(self):
+        self._compiled.clear()
+        self.conflicts.clear()
+        self.course_hits = self.course_misses = 0
+        return self
+
+    # internal methods
+
+    def compile_course(self, course):
+        """Internal use. Returns the reduced sections, their EquivalentSections and the
+        pruning stat of the given course, computing them only once for each set of
+        scheduler settings.
+        """
+        settings = (
+            self.free_sections_only,
+            self.linked_sections,
+            tuple(timerange.occupancy for timerange in self._excluded_times),
+            tuple(self._filters),
+        )
+        if settings != self._settings:
+            self._compiled.clear()
+            self._settings = settings
+        # keyed by identity: a Course equals its refreshed copy from a newer catalog,
+        # but that copy has other Section objects and seats. The course is kept with
+        # its result so its id isn't reused while it's cached.
+        try:
+            cached, result = self._compiled[id(course)]
+        except KeyError:
+            self.course_misses += 1
+            domains, stats = super(BatchScheduler, self).reduce_domains([course])
+            sections = domains[0][1]
+            result = (sections, self.group_sections(sections), stats[0])
+            self._compiled[id(course)] = (course, result)
+            return result
+        self.course_hits += 1
+        return result
+
+    def reduce_domains(self, courses):
+        if isinstance(courses, dict):
+            return super(BatchScheduler, self).reduce_domains(courses)
+        domains, stats = [], []
+        for course in courses:
+            sections, groups, stat = self.compile_course(course)
+            domains.append((course, sections))
+            stats.append(stat)
+            if not sections:
+                break
+        return domains, stats
+
+    def create_solver(self, courses, grouped=False):
+        if isinstance(courses, dict) or self.backend != 'native':
+            return super(BatchScheduler, self).create_solver(courses, grouped)
+        domains, self.pruning_stats = [], []
+        for course in courses:
+            sections, groups, stat = self.compile_course(course)
+            domains.append((course, groups if grouped else sections))
+            self.pruning_stats.append(stat)
+            if not sections:
+                break
+        if self.can_group:
+            return SectionSolver(domains, self.section_constraint, operator.attrgetter('occupancy'))
+        return SectionSolver(domains, self.conflicts)
+
+
+def schedule_batch(course_sets, excluded_times=(), free_sections_only=True, count=False, section_constraint=None):
+    """Returns the schedules (or the number of schedules, if count is True) of each of the
+    given course sets, sharing one BatchScheduler between all of them.
+    """
+    s = BatchScheduler(free_sections_only, constraint=section_constraint)
+    s.exclude_times(*tuple(excluded_times))
+    return s.schedule_batch(course_sets, count)
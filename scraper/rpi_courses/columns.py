@@ -0,0 +1,127 @@
+"""columns.py - A columnar (NumPy) view of all the periods of a catalog.
+
+Every period becomes one row of parallel arrays, which allows vectorized
+queries over a whole semester instead of walking Period objects one at a
+time. Results follow the same rules as the models: times are inclusive and
+TBA periods never conflict.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from rpi_courses.models import MINUTES_PER_DAY, to_minutes
+
+
+__all__ = ['PeriodColumns']
+
+
+class PeriodColumns(object):
+    """Parallel arrays with one row per period of the given courses.
+
+    ``start``, ``end``: minutes since midnight (int16), -1 for TBA periods.
+    ``day_mask``: one bit per day of the week, Monday being bit 0 (uint8).
+    ``type_code``: index into ``types`` of the period type (uint8).
+    ``section_index``: index into ``sections`` of the period's section (int32).
+    ``course_index``: index into ``courses`` of each section's course (int32).
+    """
+    def __init__(self, courses):
+        if np is None:
+            raise ImportError("PeriodColumns requires numpy")
+        self.courses = tuple(courses)
+        self.sections = []
+        course_index, types = [], {}
+        start, end, day_mask, type_code, section_index = [], [], [], [], []
+        for c, course in enumerate(self.courses):
+            for section in course.sections:
+                for period in section.periods:
+                    if period.tba:
+                        start.append(-1)
+                        end.append(-1)
+                    else:
+                        start.append(to_minutes(period.start))
+                        end.append(to_minutes(period.end))
+                    mask = 0
+                    for day in period.int_days:
+                        mask |= 1 << day
+                    day_mask.append(mask)
+                    type_code.append(types.setdefault(period.type, len(types)))
+                    section_index.append(len(self.sections))
+                self.sections.append(section)
+                course_index.append(c)
+        self.types = tuple(types)
+        self.start = np.array(start, dtype=np.int16)
+        self.end = np.array(end, dtype=np.int16)
+        self.day_mask = np.array(day_mask, dtype=np.uint8)
+        self.type_code = np.array(type_code, dtype=np.uint8)
+        self.section_index = np.array(section_index, dtype=np.int32)
+        self.course_index = np.array(course_index, dtype=np.int32)
+        self._positions = dict((id(s), i) for i, s in enumerate(self.sections))
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def scheduled(self):
+        "Boolean array of the periods with announced times that can conflict."
+        return (self.start >= 0) & (self.end >= self.start)
+
+    def type_mask(self, type):
+        "Returns a boolean array of the periods of the given type (e.g. - 'LAB')."
+        if type not in self.types:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_code == self.types.index(type)
+
+    def overlapping(self, start, end, days):
+        """Returns the sections with a period that overlaps the given time range, in
+        catalog order.
+
+        ``start`` and ``end`` are in military integer times (e.g. - 1200 1430).
+        ``days`` is a collection of integer days of the week.
+        """
+        mask = 0
+        for day in days:
+            mask |= 1 << day
+        hits = self.scheduled & ((self.day_mask & mask) != 0) & \
+            (self.start <= to_minutes(end)) & (self.end >= to_minutes(start))
+        return [self.sections[i] for i in np.unique(self.section_index[hits])]
+
+    def conflict_matrix(self, sections):
+        """Returns a boolean matrix where [i, j] is True if sections[i] conflicts with
+        sections[j], as Section.conflicts_with would say.
+        """
+        positions = np.array([self._positions[id(s)] for s in sections], dtype=np.int32)
+        # the periods of the given sections, and which of them each period is from
+        owner = np.full(len(self.sections), -1, dtype=np.int32)
+        owner[positions] = np.arange(len(positions), dtype=np.int32)
+        rows = np.nonzero((owner[self.section_index] >= 0) & self.scheduled)[0]
+        start, end, days = self.start[rows], self.end[rows], self.day_mask[rows]
+        overlap = (start[:, None] <= end[None, :]) & (start[None, :] <= end[:, None]) & \
+            ((days[:, None] & days[None, :]) != 0)
+        # periods x sections membership, to fold period overlaps into section conflicts
+        membership = np.zeros((len(rows), len(positions)), dtype=np.int32)
+        membership[np.arange(len(rows)), owner[self.section_index[rows]]] = 1
+        return (membership.T @ overlap.astype(np.int32) @ membership) > 0
+
+    def day_histogram(self, bin_minutes=30, sections=None):
+        """Returns an array of shape (7, bins per day) with the number of periods that
+        meet during each bin of each day of the week.
+
+        ``sections``: Only count the periods of these sections. Defaults to all of them.
+        """
+        rows = self.scheduled
+        if sections is not None:
+            wanted = np.zeros(len(self.sections), dtype=bool)
+            wanted[[self._positions[id(s)] for s in sections]] = True
+            rows = rows & wanted[self.section_index]
+        bins = -(-MINUTES_PER_DAY // bin_minutes)
+        counts = np.zeros((7, bins + 1), dtype=np.int32)
+        first = self.start[rows] // bin_minutes
+        last = self.end[rows] // bin_minutes
+        days = self.day_mask[rows]
+        for day in range(7):
+            on_day = (days & (1 << day)) != 0
+            # +1 where a period starts and -1 after it ends, summed up below
+            np.add.at(counts[day], first[on_day], 1)
+            np.add.at(counts[day], last[on_day] + 1, -1)
+        return np.cumsum(counts, axis=1)[:, :bins]
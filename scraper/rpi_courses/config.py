@@ -1,9 +1,14 @@
 import logging
 import logging.handlers
+import os
 import sys
 
 DEBUG = False
 LOG_FILENAME = 'logging'
+# where parsed catalogs are saved to skip parsing them again. None or '' disables it.
+CACHE_DIR = os.environ.get(
+    'RPI_COURSES_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'rpi_courses')
+)
 
 # P3: Logging setup remains identical
 logger = logging.getLogger('rpi_courses')
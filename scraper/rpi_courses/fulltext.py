@@ -0,0 +1,171 @@
+"""fulltext.py - Ranked full-text search over the course descriptions.
+
+Indexes the courses of rpi_courses.json (Code, Name, Description, ...) and ranks
+them with BM25, counting words in the name and code more than words in the
+description. The index is saved next to the JSON file and loaded from there
+until the JSON changes, so searching doesn't need to read the JSON again.
+"""
+from array import array
+import json
+import math
+import os
+import pickle
+import re
+
+from rpi_courses.config import logger
+
+
+__all__ = ['FullTextIndex', 'tokenize', 'stem']
+
+# bump this whenever tokenize, stem or what's saved changes
+INDEX_VERSION = 1
+
+RE_WORD = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from in into is it its of on or such that the their this
+to was were will with which who students student course courses none listed
+""".split())
+
+# (suffix, replacement), the first one that matches is used
+SUFFIXES = (
+    ('ational', 'ate'), ('ization', 'ize'), ('ations', 'ate'), ('ation', 'ate'),
+    ('ments', ''), ('ment', ''), ('ities', 'ity'), ('ies', 'y'), ('sses', 'ss'),
+    ('ing', ''), ('ed', ''), ('ss', 'ss'), ('s', ''),
+)
+
+
+def stem(word):
+    """Strips the most common English suffixes, so that 'programming', 'programs' and
+    'program' all match each other. Short words and numbers are left alone.
+    """
+    if len(word) <= 4 or word.isdigit():
+        return word
+    stemmed = word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix):
+            stemmed = word[:len(word) - len(suffix)] + replacement
+            break
+    if len(stemmed) > 4 and stemmed.endswith('e'):
+        stemmed = stemmed[:-1]
+    if len(stemmed) > 3 and stemmed[-1] == stemmed[-2] and stemmed[-1] not in 'lsz':
+        stemmed = stemmed[:-1]
+    return stemmed if len(stemmed) >= 3 else word
+
+
+def tokenize(text):
+    "Returns the stemmed words of the given text, without stopwords."
+    return [stem(w) for w in RE_WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+class FullTextIndex(object):
+    """BM25 ranking over the fields of course dicts.
+
+    ``courses``: dicts with at least a 'Code' and a 'Name', like rpi_courses.json holds.
+    ``fields``: (field, boost) pairs. A word counts boost times for each time it appears
+                in that field. Defaults to FIELDS.
+    ``k1``, ``b``: The BM25 parameters for how fast repeated words stop counting and how
+                   much longer courses are penalized.
+    """
+    FIELDS = (
+        ('Code', 3.0),
+        ('Name', 2.5),
+        ('Description', 1.0),
+        ('Prerequisites', 0.5),
+        ('Corequisites', 0.5),
+    )
+
+    def __init__(self, courses=(), fields=None, k1=1.2, b=0.75):
+        self.fields = tuple(fields or self.FIELDS)
+        self.k1, self.b = k1, b
+        self.courses = []
+        # term: (docs, weighted counts), as arrays in doc order so that loading is fast
+        self.postings = {}
+        lengths = []
+        for course in courses:
+            doc = len(self.courses)
+            self.courses.append((course.get('Code', ''), course.get('Name', '')))
+            counts, length = {}, 0.0
+            for field, boost in self.fields:
+                for term in tokenize(course.get(field) or ''):
+                    counts[term] = counts.get(term, 0.0) + boost
+                    length += boost
+            for term, count in counts.items():
+                if term not in self.postings:
+                    self.postings[term] = (array('I'), array('d'))
+                docs, weights = self.postings[term]
+                docs.append(doc)
+                weights.append(count)
+            lengths.append(length)
+        average = sum(lengths) / len(lengths) if lengths else 0.0
+        # the length part of the BM25 denominator only depends on the doc
+        self.norms = array('d', (k1 * (1 - b + b * length / average) if average else k1 for length in lengths))
+
+    def __len__(self):
+        return len(self.courses)
+
+    @staticmethod
+    def from_json(json_path, index_path=None):
+        """Returns the index of the courses of the given JSON file. Loads the saved index if
+        it was built from the JSON file as it is now, otherwise builds and saves it.
+
+        ``index_path``: Where the index is saved. Defaults to the JSON path with the
+                        extension replaced by '.index.pickle'.
+        """
+        index_path = index_path or os.path.splitext(json_path)[0] + '.index.pickle'
+        source = FullTextIndex._source(json_path)
+        try:
+            with open(index_path, 'rb') as f:
+                saved = pickle.load(f)
+            if saved['version'] == INDEX_VERSION and saved['source'] == source:
+                return saved['index']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning('Rebuilding broken search index %s: %s' % (index_path, e))
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            index = FullTextIndex(json.load(f))
+        index.save(index_path, source)
+        return index
+
+    def save(self, index_path, source=None):
+        "Saves this index. ``source`` is what from_json compares to know the index is current."
+        tmp_path = index_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': INDEX_VERSION, 'source': source, 'index': self}, f,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            logger.warning('Could not save search index %s: %s' % (index_path, e))
+
+    def search(self, query, limit=10):
+        """Returns the best matches of the query as (code, name, score) tuples, best first.
+        Ties keep the order of the courses.
+
+        ``limit``: The most results to return. None returns every course that matches.
+        """
+        scores = {}
+        count = len(self.courses)
+        k1, norms = self.k1, self.norms
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            docs, weights = posting
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc, weight in zip(docs, weights):
+                scores[doc] = scores.get(doc, 0.0) + idf * weight * (k1 + 1) / (weight + norms[doc])
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.courses[doc] + (score,) for doc, score in ranked]
+
+    # internal methods
+
+    @staticmethod
+    def _source(json_path):
+        "Internal use. Identifies the current contents of the JSON file without reading it."
+        stat = os.stat(json_path)
+        return (os.path.basename(json_path), stat.st_size, stat.st_mtime_ns)
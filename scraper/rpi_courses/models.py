@@ -3,6 +3,9 @@
 Generally, all instances should be read only.
 """
 from datetime import time
+import functools
+import hashlib
+import operator
 # CRITICAL P3 FIX: collections.Mapping is now in collections.abc
 import collections.abc
 
@@ -15,7 +18,20 @@ class ReadOnly(object):
     a equivalent getter property without the underscore prefix.
 
     This restricts all those attributes to read-only.
+
+    Subclasses that list their attributes in ``__slots__`` get a real property for
+    each of them when the class is created, so reading them never goes through
+    __getattr__ and instances don't carry a __dict__.
     """
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.__dict__.get('__slots__', ()):
+            # skip private (name mangled) slots
+            if name.startswith('_') and not name.startswith('__') and not hasattr(cls, name[1:]):
+                setattr(cls, name[1:], property(operator.attrgetter(name)))
+
     def __getattr__(self, key):
         if not key.startswith('_') and not key.endswith('__'):
             value = getattr(self, '_' + key)
@@ -41,6 +57,8 @@ class CrossListing(ReadOnly):
     """Represents a crosslisted set of CRNs and Seats.
     This is immutable once created.
     """
+    __slots__ = ('_crns', '_seats')
+
     def __init__(self, crns, seats):
         self._crns, self._seats = frozenset(crns), seats
 
@@ -63,8 +81,106 @@ DAY_MAPPER = {
     6: 'Sunday',
 }
 
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(military_time):
+    "Converts a military integer time (e.g. - 1430) into minutes since midnight."
+    hours, minutes = divmod(military_time, 100)
+    return hours * 60 + minutes
+
+
+# _DAYS_OF[day_bits]: the days of the week set in a 7-bit day mask, in order
+_DAYS_OF = tuple(tuple(day for day in range(7) if bits >> day & 1) for bits in range(128))
+# _SLOTS[day_bits][day]: the index of the day's minutes in the day masks of day_bits
+_SLOTS = tuple(tuple(len(_DAYS_OF[bits & ((1 << day) - 1)]) for day in range(7)) for bits in range(128))
+
+
+@functools.lru_cache(maxsize=None)
+def minute_mask(start, end):
+    """Returns the minutes of a day from ``start`` to ``end`` inclusive as an int bitmask
+    of MINUTES_PER_DAY bits. TBA time ranges (``None``) occupy nothing.
+
+    The masks are cached, so all the periods that meet at the same times share one int.
+    """
+    if start is None or end is None:
+        return 0
+    first, last = to_minutes(start), to_minutes(end)
+    if last < first:
+        return 0
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def week_mask(start, end, int_days):
+    """Returns the weekly occupancy of the given time range as an int bitmask.
+
+    Each day of the week gets MINUTES_PER_DAY bits (Monday first) and every minute
+    from ``start`` to ``end`` inclusive is set, so two time ranges conflict exactly
+    when their masks share a bit. TBA time ranges (``None``) occupy nothing.
+    """
+    minutes = minute_mask(start, end)
+    mask = 0
+    if minutes:
+        for day in set(int_days):
+            mask |= minutes << (day * MINUTES_PER_DAY)
+    return mask
+
+
+def merge_days(items):
+    """Returns the (day_bits, day_masks) of the union of the given (day_bits, day_masks)
+    pairs. ``day_bits`` has one bit per occupied day (Monday being bit 0) and
+    ``day_masks`` holds the minute_mask of each of those days, in order. Days with a
+    single mask keep that same int.
+    """
+    masks = [0] * 7
+    for bits, day_masks in items:
+        for day, minutes in zip(_DAYS_OF[bits], day_masks):
+            masks[day] = masks[day] | minutes if masks[day] else minutes
+    bits = 0
+    for day in range(7):
+        if masks[day]:
+            bits |= 1 << day
+    return bits, tuple(minutes for minutes in masks if minutes)
+
+
+def days_conflict(bits1, masks1, bits2, masks2):
+    "Returns True if the two (day_bits, day_masks) pairs share a minute. One AND per common day."
+    common = bits1 & bits2
+    if not common:
+        return False
+    slots1, slots2 = _SLOTS[bits1], _SLOTS[bits2]
+    for day in _DAYS_OF[common]:
+        if masks1[slots1[day]] & masks2[slots2[day]]:
+            return True
+    return False
+
+
+# only a few schedules are searched at a time, so a small cache keeps most lookups cheap
+# without storing a whole week on every section again
+@functools.lru_cache(maxsize=1024)
+def days_to_week(bits, masks):
+    "Returns the week_mask style occupancy of the given (day_bits, day_masks) pair."
+    mask = 0
+    for day, minutes in zip(_DAYS_OF[bits], masks):
+        mask |= minutes << (day * MINUTES_PER_DAY)
+    return mask
+
+
+def content_digest(*fields):
+    """Returns a blake2b digest of the repr of the given fields (strings, ints, None,
+    bytes and tuples of them). Unlike hash(), it is the same in every process, so it
+    can be used to key caches that are shared between processes or saved to disk.
+    """
+    return hashlib.blake2b(repr(fields).encode('utf-8'), digest_size=16).digest()
+
+
+def _stable_hash(digest):
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
 
 class Period(ReadOnly):
+    __slots__ = ('_type', '_instructor', '_location', '_start', '_end', '_int_days', '_day_bits', '_minute_mask', '_digest')
+
     def __init__(self, type, instructor, start, end, location, int_days):
         self._type, self._instructor, self._location = \
             type.strip(), instructor.strip(), location.strip()
@@ -77,7 +193,14 @@ class Period(ReadOnly):
             
         # P3: map returns an iterator, tuple() correctly consumes it
         self._int_days = tuple(map(int, int_days))
-        self.__hash = None
+        self._minute_mask = minute_mask(self._start, self._end)
+        self._day_bits = 0
+        if self._minute_mask:
+            for day in self._int_days:
+                self._day_bits |= 1 << day
+        self._digest = content_digest(
+            self._type, self._instructor, self._location, self._start, self._end, self._int_days
+        )
 
     # P3: __repr__ is identical
     def __repr__(self):
@@ -85,20 +208,25 @@ class Period(ReadOnly):
             self.start, self.end, self.days
         )
 
-    # P3: __eq__ is identical
     def __eq__(self, other):
+        # the digest covers exactly the fields compared below
+        if isinstance(other, Period):
+            return self._digest == other._digest
         return (self.type, self.instructor, self.location, self.start, self.end, \
             self.int_days) == (other.type, other.instructor, other.location, \
             other.start, other.end, other.int_days)
 
-    # P3: __hash__ is identical
     def __hash__(self):
-        if self.__hash is None:
-            result = hash(self.type)
-            for v in (self.instructor, self.location, self.start, self.end, self.int_days):
-                result = result ^ hash(v)
-            self.__hash = result
-        return self.__hash
+        return _stable_hash(self._digest)
+
+    def __reduce__(self):
+        # pickle the fields only, the masks are rebuilt (and shared again) from them
+        return (Period, (self._type, self._instructor, str(self._start), str(self._end),
+                         self._location, self._int_days))
+
+    @property
+    def hexdigest(self):
+        return self._digest.hex()
 
     @staticmethod
     def from_soup_tag(tag):
@@ -134,23 +262,21 @@ class Period(ReadOnly):
         hours, minutes = (s[:-2], s[-2:])
         return time(hour=int(hours), minute=int(minutes))
 
-    # P3: conflicts_with is identical
-    def conflicts_with(self, period):
-        "Checks this period conflicts with another period."
-        if self.tba or period.tba:
-            return False
-        same_day = False
-        for i in self.int_days:
-            if i in period.int_days:
-                same_day = True
+    @property
+    def occupancy(self):
+        "The weekly occupancy of this period as a week_mask."
+        return days_to_week(self._day_bits, self.day_masks)
 
-        if not same_day:
-            return False
+    @property
+    def day_masks(self):
+        "The minute_mask of each day of day_bits, for merge_days and days_conflict."
+        return (self._minute_mask,) * len(_DAYS_OF[self._day_bits])
 
-        return self.start <= period.start <= self.end or \
-            period.start <= self.start <= period.end or \
-            self.start <= period.end <= self.end or \
-            period.start <= self.end <= period.end
+    def conflicts_with(self, period):
+        """Checks this period conflicts with another period.
+        TBA periods never conflict, since they have no days.
+        """
+        return bool(self._day_bits & period._day_bits and self._minute_mask & period._minute_mask)
 
     # P3: Properties are identical
     @property
@@ -189,29 +315,47 @@ class Section(ReadOnly):
     It is uniquely represented in SIS via CRN. The CRN is used for
     registration.
     """
+    __slots__ = ('_crn', '_seats_taken', '_seats_total', '_num', '_periods', '_notes', '_day_bits', '_day_masks', '_digest')
+
     def __init__(self, crn, num, taken, total, periods, notes):
         self._crn, self._seats_taken, self._seats_total = \
             safeInt(crn), int(taken), int(total)
         self._num = num
         self._periods = tuple(periods)
         self._notes = tuple(set(notes))
-        self.__hash = None
+        self._day_bits, self._day_masks = merge_days((p.day_bits, p.day_masks) for p in self._periods)
+        # seats are left out, since they can be updated
+        self._digest = content_digest(
+            self._crn, self._num, tuple(p._digest for p in self._periods)
+        )
 
-    # P3: __hash__ is identical
     def __hash__(self):
-        if self.__hash is None:
-            result = hash(self.crn)
-            for v in (self.seats_taken, self.seats_total, self.num, self.periods, self.notes):
-                result = result ^ hash(v)
-            self.__hash = result
-        return self.__hash
-
-    # P3: conflicts_with is identical
+        return _stable_hash(self._digest)
+
+    def __reduce__(self):
+        return (Section, (self._crn, self._num, self._seats_taken, self._seats_total,
+                          self._periods, self._notes))
+
+    @property
+    def hexdigest(self):
+        return self._digest.hex()
+
+    @property
+    def occupancy(self):
+        "The weekly occupancy of all the periods as a week_mask."
+        return days_to_week(self._day_bits, self._day_masks)
+
     def conflicts_with(self, section):
-        for period in self.periods:
-            for p in section.periods:
-                if period.conflicts_with(p):
-                    return True
+        "Checks if any period of this section conflicts with the given section's."
+        # days_conflict, inlined since the solvers call this for every pair of values
+        common = self._day_bits & section._day_bits
+        if not common:
+            return False
+        mine, theirs = _SLOTS[self._day_bits], _SLOTS[section._day_bits]
+        masks, other_masks = self._day_masks, section._day_masks
+        for day in _DAYS_OF[common]:
+            if masks[mine[day]] & other_masks[theirs[day]]:
+                return True
         return False
 
     @staticmethod
@@ -232,7 +376,27 @@ class Section(ReadOnly):
             periods, notes
         )
 
+    def update_seats(self, taken, total=None):
+        """Sets the seat counts of this section after they were refreshed. This is the
+        only change allowed after creation. Call clear_cache() on its course afterwards,
+        which CourseCatalog.update_seats already does.
+        """
+        self._seats_taken = int(taken)
+        if total is not None:
+            self._seats_total = int(total)
+
     # P3: Properties are identical
+    @property
+    def component(self):
+        """Returns the kind of meeting this section is for: the period type if all of its
+        periods are labs, recitations, studios or tests, otherwise 'LEC'. A course with
+        sections of more than one component needs one section of each.
+        """
+        types = set(p.type for p in self.periods)
+        if len(types) == 1 and not self.periods[0].is_lecture:
+            return types.pop()
+        return 'LEC'
+
     @property
     def is_study_abroad(self):
         return self.num in ('SA', 'EXC')
@@ -267,37 +431,182 @@ class Section(ReadOnly):
             total=self.seats_total,
         )
 
-    # P3: __eq__ is identical
     def __eq__(self, other):
+        # the digest covers the crn, num and periods
         if isinstance(other, Section):
-            return (
-                self.crn == other.crn and self.num == other.num and
-                self.periods == other.periods
-            )
+            return self._digest == other._digest
+        return NotImplemented
+
+
+class EquivalentSections(ReadOnly):
+    """Sections of the same course that meet at exactly the same times. They are
+    interchangeable when scheduling, so the scheduler can treat them as one value.
+    """
+    __slots__ = ('_sections', '_day_bits', '_day_masks')
+
+    def __init__(self, sections):
+        self._sections = tuple(sections)
+        self._day_bits, self._day_masks = self._sections[0]._day_bits, self._sections[0]._day_masks
+
+    def __repr__(self):
+        return "<EquivalentSections: crns={crns!r}>".format(crns=self.crns)
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    @property
+    def occupancy(self):
+        return days_to_week(self._day_bits, self._day_masks)
+
+    def conflicts_with(self, section):
+        "Checks if these sections conflict with the given section."
+        # days_conflict, inlined since the solvers call this for every pair of values
+        common = self._day_bits & section._day_bits
+        if not common:
+            return False
+        mine, theirs = _SLOTS[self._day_bits], _SLOTS[section._day_bits]
+        masks, other_masks = self._day_masks, section._day_masks
+        for day in _DAYS_OF[common]:
+            if masks[mine[day]] & other_masks[theirs[day]]:
+                return True
+        return False
+
+    @property
+    def crns(self):
+        "The CRNs of all the sections (and of the sections of SectionGroups), once each."
+        crns = []
+        for section in self._sections:
+            for crn in section.crns if isinstance(section, SectionGroup) else (section.crn,):
+                if crn not in crns:
+                    crns.append(crn)
+        return tuple(crns)
+
+    @property
+    def periods(self):
+        "The periods of the first section, which has the same times as all the others."
+        return self._sections[0].periods
+
+    @property
+    def seats_left(self):
+        "Returns the most seats left in any of the sections."
+        return max(s.seats_left for s in self._sections)
+
+
+class SectionGroup(ReadOnly):
+    """A set of linked sections of one course, one for each of its components (e.g. - a
+    lecture and a lab), that don't conflict with each other. The scheduler can pick it
+    like a single section.
+    """
+    __slots__ = ('_sections', '_day_bits', '_day_masks', '_digest')
+
+    def __init__(self, sections):
+        self._sections = tuple(sections)
+        self._day_bits, self._day_masks = merge_days((s._day_bits, s._day_masks) for s in self._sections)
+        self._digest = content_digest(tuple(s.digest for s in self._sections))
+
+    def __repr__(self):
+        return "<SectionGroup: crns={crns!r}>".format(crns=self.crns)
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __eq__(self, other):
+        return isinstance(other, SectionGroup) and self.sections == other.sections
+
+    def __hash__(self):
+        return _stable_hash(self._digest)
+
+    @property
+    def hexdigest(self):
+        return self._digest.hex()
+
+    @property
+    def occupancy(self):
+        return days_to_week(self._day_bits, self._day_masks)
+
+    def conflicts_with(self, section):
+        "Checks if any of these sections conflict with the given section."
+        # days_conflict, inlined since the solvers call this for every pair of values
+        common = self._day_bits & section._day_bits
+        if not common:
+            return False
+        mine, theirs = _SLOTS[self._day_bits], _SLOTS[section._day_bits]
+        masks, other_masks = self._day_masks, section._day_masks
+        for day in _DAYS_OF[common]:
+            if masks[mine[day]] & other_masks[theirs[day]]:
+                return True
         return False
 
+    @property
+    def crns(self):
+        return tuple(s.crn for s in self._sections)
+
+    @property
+    def periods(self):
+        return tuple(p for s in self._sections for p in s.periods)
+
+    @property
+    def seats_left(self):
+        "Returns the fewest seats left in any of the sections, since all of them are needed."
+        return min(s.seats_left for s in self._sections)
+
+    @property
+    def is_filled(self):
+        return any(s.is_filled for s in self._sections)
+
+
+def link_sections(sections):
+    """Returns the SectionGroups of the given sections of one course, as described in
+    Course.section_groups.
+    """
+    components = {'LEC': []}
+    for section in sections:
+        components.setdefault(section.component, []).append(section)
+    groups = [()]
+    for sections in components.values():
+        if not sections:
+            continue
+        groups = [
+            group + (s,)
+            for group in groups
+            for s in sections
+            if not any(s.conflicts_with(other) for other in group)
+        ]
+    return tuple(SectionGroup(group) for group in groups)
+
 
 class Course(ReadOnly):
     """Represents a particular kind of course and its sections.
     Also immutable once created.
     """
+    __slots__ = ('_name', '_dept', '_num', '_cred', '_grade_type', '_sections', '_digest', '__crns', '__free_sections', '__groups')
+
     def __init__(self, name, dept, num, credmin, credmax, grade_type, sections):
         self._name, self._dept, self._num, self._cred, self._grade_type = \
             name.strip(), dept.strip(), safeInt(num, warn_only=True), \
             (int(credmin), int(credmax)), grade_type.strip(),
         self._sections = tuple(sections)
+        self.__crns = frozenset(s.crn for s in self._sections)
         self.__free_sections = None
-        self.__hash = None
+        self.__groups = None
+        self._digest = content_digest(
+            self._name, self._dept, self._num, self._cred, self._grade_type,
+            tuple(s._digest for s in self._sections)
+        )
 
-    # P3: __contains__ is identical
     def __contains__(self, crn):
-        for section in self.sections:
-            if section.crn == crn:
-                return True
-        return False
+        return crn in self.__crns
 
-    # P3: __eq__ is identical
     def __eq__(self, other):
+        # the digest covers all the fields compared below, including every section
+        if isinstance(other, Course):
+            return self._digest == other._digest
         return (
             self.num == other.num and self.cred == other.cred and
             self.grade_type == other.grade_type and
@@ -305,14 +614,12 @@ class Course(ReadOnly):
             self.sections == other.sections
         )
 
-    # P3: __hash__ is identical
     def __hash__(self):
-        if self.__hash is None:
-            result = hash(self.name)
-            for v in (self.dept, self.num, self.cred[0], self.cred[1], self.grade_type, self.sections):
-                result = result ^ hash(v)
-            self.__hash = result
-        return self.__hash
+        return _stable_hash(self._digest)
+
+    @property
+    def hexdigest(self):
+        return self._digest.hex()
 
     def __str__(self):
         # CRITICAL P3 FIX: Convert Python 2 dictionary formatting
@@ -347,6 +654,21 @@ class Course(ReadOnly):
             self.__free_sections = tuple(s for s in self.sections if s.seats_left > 0)
         return self.__free_sections
 
+    def clear_cache(self):
+        """Forgets the available sections, for after the seats of a section changed.
+        """
+        self.__free_sections = None
+
+    @property
+    def section_groups(self):
+        """Returns every SectionGroup of this course: one section of each component,
+        without conflicts between them. Lectures come first in each group. If all the
+        sections are of the same component, each group holds a single section.
+        """
+        if self.__groups is None:
+            self.__groups = link_sections(self.sections)
+        return self.__groups
+
     @property
     def credits(self):
         """Returns either a tuple representing the credit range or a
@@ -0,0 +1,56 @@
+"""parallel.py - Spreads a SectionSolver search over a pool of processes.
+
+The search is split on the values of the variable the solver starts with, and
+every value becomes one task. The solver is sent to each worker once, when the
+pool starts, and tasks and results only carry indices into its domains.
+"""
+import multiprocessing
+
+
+__all__ = ['iter_parallel_solutions']
+
+# the solver of the current worker process, set by _init_worker
+_worker = None
+
+
+def _init_worker(solver):
+    global _worker
+    positions = [dict((id(value), i) for i, value in enumerate(values))
+                 for variable, values in solver.domains]
+    _worker = (solver, positions)
+
+
+def _solve_branch(index):
+    "Returns the solutions of one branch as tuples of value positions in each domain."
+    solver, positions = _worker
+    return [
+        tuple(positions[i][id(solution[variable])] for i, variable in enumerate(solver.variables))
+        for solution in solver.iter_branch(index)
+    ]
+
+
+def iter_parallel_solutions(solver, processes=None, ordered=True):
+    """Returns a generator of all the solutions of the given solver, computed by a pool of
+    worker processes.
+
+    ``processes``: The number of worker processes. Defaults to the number of CPUs.
+    ``ordered``: If True, solutions come in the same order as solver.iter_solutions().
+        Otherwise they come as soon as any worker finishes its branch.
+    """
+    variable, values = solver.split()
+    if not values:
+        # no branches to split on, so nothing to gain from the pool
+        yield from solver.iter_solutions()
+        return
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(solver,))
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for positions in imap(_solve_branch, range(len(values))):
+            for solution in positions:
+                yield dict(
+                    (var, vals[i]) for (var, vals), i in zip(solver.domains, solution)
+                )
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -4,6 +4,7 @@ import urllib.request
 from bs4 import BeautifulSoup
 
 from rpi_courses.web import get 
+from rpi_courses.search import TrigramIndex, PrefixIndex, FuzzyIndex
 from rpi_courses.parser.program_features import program_details_feature # Import the new program feature
 
 # Note: The original file had a glob import which implies other features exist.
@@ -47,6 +48,9 @@ class CourseCatalog(object):
         self.crosslistings = {}
         self.programs = {} 
         self.courses = {}
+        self._search_index = None
+        self._prefix_index = None
+        self._fuzzy_index = None
         self.soup = soup 
         self.timestamp = 0
         self.datetime = datetime.datetime.now()
@@ -83,6 +87,9 @@ class CourseCatalog(object):
         # Merge the parsed programs
         self.programs.update(temp_catalog.programs)
         self.courses.update(temp_catalog.courses)
+        self._search_index = self._fuzzy_index = None
+        if self._prefix_index is not None:
+            self._prefix_index.update(self.courses)
         self.crosslistings.update(temp_catalog.crosslistings)
 
 
@@ -95,12 +102,23 @@ class CourseCatalog(object):
     def crosslisted_with(self, crn):
         return tuple([c for c in self.crosslistings.get(crn, DummyCrosslisting()).crns if c != crn])
 
-    def find_courses(self, partial):
-        partial = partial.lower()
-        keys = self.courses.keys()
-        keys = [k for k in keys if k.lower().find(partial) != -1]
-        courses = [self.courses[k] for k in keys]
-        return list(set(courses))
+    def find_courses(self, partial, limit=None):
+        "Case-insensitive substring search of the course keys, in their sorted order."
+        if self._search_index is None:
+            self._search_index = TrigramIndex((key, self.courses[key]) for key in sorted(self.courses))
+        return self._search_index.search(partial, limit)
+
+    def complete(self, prefix, limit=10):
+        "Returns the courses whose code or name starts with the given prefix, for autocompletion."
+        if self._prefix_index is None:
+            self._prefix_index = PrefixIndex(self.courses)
+        return self._prefix_index.complete(prefix, limit)
+
+    def find_similar_courses(self, query, max_distance=2, limit=10):
+        "Finds courses by a code or title that may have typos, closest first."
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self.courses)
+        return [course for distance, course in self._fuzzy_index.lookup(query, max_distance, limit)]
 
     def get_courses(self):
         return list(self.courses.values())
@@ -111,8 +129,10 @@ class CourseCatalog(object):
                 return course
         return None
 
-    def find_course(self, partial):
-        courses = self.find_courses(partial)
+    def find_course(self, partial, fuzzy=False):
+        courses = self.find_courses(partial, limit=1)
+        if not courses and fuzzy:
+            courses = self.find_similar_courses(partial, limit=1)
         return courses[0] if courses else None
         
     def find_course_and_crosslistings(self, partial):
@@ -1,7 +1,36 @@
+import base64
+import hashlib
+import heapq
+import itertools
+import json
+import operator
+
 from pyconstraints import Problem, is_nil, BruteForceSolver
 
+from rpi_courses.models import DAY_MAPPER, EquivalentSections, week_mask
+from rpi_courses.solver import SectionSolver
+from rpi_courses.parallel import iter_parallel_solutions
+from rpi_courses.scoring import GapMinutes
+
+
+__all__ = ['compute_schedules', 'expand_schedules', 'schedules_to_jsonl', 'day_number', 'TimeRange', 'Scheduler']
+
+DAY_NUMBERS = dict((name.lower(), number) for number, name in DAY_MAPPER.items())
 
-__all__ = ['compute_schedules', 'TimeRange', 'Scheduler']
+
+def day_number(day):
+    """Returns the integer day of the week (Monday being 0) of the given integer or
+    fully-spelt day name. Raises ValueError for anything else.
+    """
+    if isinstance(day, str):
+        number = DAY_NUMBERS.get(day.strip().lower())
+    else:
+        number = day if day in DAY_MAPPER else None
+    if number is None:
+        raise ValueError("Unknown day of the week %r, expected 0-6 or one of %r" % (
+            day, tuple(DAY_MAPPER[i].lower() for i in sorted(DAY_MAPPER))
+        ))
+    return number
 
 
 class TimeRange(object):
@@ -10,6 +39,8 @@ class TimeRange(object):
         self.start = start
         self.end = end
         self.days_of_week = dow
+        self.int_days = tuple(day_number(d) for d in dow)
+        self.occupancy = week_mask(start, end, self.int_days)
 
     def __repr__(self):
         return "<TimeRange: %r to %r on %r>" % (
@@ -17,31 +48,17 @@ class TimeRange(object):
         )
 
     def days_conflict(self, days):
-        # CRITICAL P3 FIX: print statement
-        print(self.days_of_week, days) 
-        for day in self.days_of_week:
-            if day in days:
-                return True
-        return False
+        "Returns True if any of the given days is one of the days of this time range."
+        return any(day_number(day) in self.int_days for day in days)
 
     def __contains__(self, period):
+        "Returns True if the given (days, start, end) tuple overlaps this time range."
         days, start, end = period
-
-        # This logic is complex, but the Python 3 comparison operators remain the same.
-        return self.days_conflict(days) and (
-            self.start <= start <= self.end or
-            start <= self.start <= end or
-            self.start <= end <= self.end or
-            start <= self.end <= end
-        )
+        return bool(self.occupancy & week_mask(start, end, [day_number(d) for d in days]))
 
     def conflicts_with(self, section):
         "Returns True if the given section conflicts with this time range."
-        for p in section.periods:
-            t = (p.int_days, p.start, p.end)
-            if t in self:
-                return True
-        return False
+        return bool(self.occupancy & section.occupancy)
 
 
 def section_constraint(section1, section2):
@@ -50,21 +67,98 @@ def section_constraint(section1, section2):
     return not section1.conflicts_with(section2)
 
 
+def expand_schedules(schedules):
+    """Returns a generator of all the schedules of individual sections from the given
+    schedules of EquivalentSections.
+    """
+    for schedule in schedules:
+        courses = tuple(schedule)
+        for sections in itertools.product(*(schedule[course].sections for course in courses)):
+            yield dict(zip(courses, sections))
+
+
+def schedules_to_jsonl(schedules, cursor=None):
+    """Returns a generator of JSON Lines for the given schedules, one per schedule. Each
+    maps the course codes to the CRN (or list of CRNs, for EquivalentSections and
+    SectionGroups) picked for them.
+    If a cursor is given, it is added as a last line of {"cursor": cursor}.
+    """
+    for schedule in schedules:
+        picks = {}
+        for course, section in schedule.items():
+            crns = getattr(section, 'crns', None)
+            picks[course.code] = section.crn if crns is None else crns
+        yield json.dumps(picks) + '\n'
+    if cursor is not None:
+        yield json.dumps({'cursor': cursor}) + '\n'
+
+
+def _section_digests(value):
+    """Yields the digests of the sections of the given domain value, looking through
+    EquivalentSections and SectionGroups (and EquivalentSections of SectionGroups).
+    """
+    sections = getattr(value, 'sections', None)
+    if sections is None:
+        yield value.digest
+        return
+    for section in sections:
+        yield from _section_digests(section)
+
+
+def _positions(sizes, start=()):
+    "Yields the index tuples of itertools.product for the given sizes, beginning at start."
+    if not sizes:
+        yield ()
+        return
+    first = start[0] if start else 0
+    for i in range(first, sizes[0]):
+        for rest in _positions(sizes[1:], start[1:] if i == first else ()):
+            yield (i,) + rest
+
+
 class Scheduler(object):
     """High-level API that wraps the course scheduling feature.
 
     ``free_sections_only``: bool. Determines if the only the available sections should be
                             used when using courses provided. Defaults to True.
     ``problem``: Optional problem instance to provide. If None, the default one is created.
+    ``linked_sections``: bool. If True, courses with separate lecture and lab/recitation
+                         sections are scheduled with their SectionGroups, so every pick
+                         holds one section of each. Defaults to False.
+    ``backend``: The solver engine to use, one of BACKENDS. 'native' uses the built-in
+                 SectionSolver and 'pyconstraints' uses the problem instance. Defaults to
+                 'pyconstraints' if a problem is given, otherwise 'native'.
 
     """
-    def __init__(self, free_sections_only=True, problem=None, constraint=None):
+    BACKENDS = ('native', 'pyconstraints')
+
+    def __init__(self, free_sections_only=True, problem=None, constraint=None, backend=None, linked_sections=False):
         self.p = Problem()
         if problem is not None:
             self.p = problem
+        if backend is None:
+            backend = 'native' if problem is None else 'pyconstraints'
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown backend %r, expected one of %r" % (backend, self.BACKENDS))
+        self.backend = backend
         self.free_sections_only = free_sections_only
+        self.linked_sections = linked_sections
         self.section_constraint = constraint or section_constraint
+        self.pruning_stats = []
         self.clear_excluded_times()
+        self.clear_filters()
+
+    def clear_filters(self):
+        """Clears all previously added section filters."""
+        self._filters = []
+        return self
+
+    def add_filter(self, predicate):
+        """Adds a section filter. Only the sections where predicate(section) is True are
+        used when scheduling.
+        """
+        self._filters.append(predicate)
+        return self
 
     def clear_excluded_times(self):
         """Clears all previously set excluded times."""
@@ -96,13 +190,24 @@ class Scheduler(object):
                 self.exclude_time(*item)
         return self
 
-    def find_schedules(self, courses=None, return_generator=False):
+    def find_schedules(self, courses=None, return_generator=False, grouped=False):
         """Returns all the possible course combinations. Assumes no duplicate courses.
 
         ``return_generator``: If True, returns a generator instead of collection. Generators
             are friendlier to your memory and save computation time if not all solutions are
             used.
+        ``grouped``: If True, each course is mapped to the EquivalentSections that were
+            picked for it instead of a single section. Only for the native backend.
         """
+        if self.backend == 'native':
+            group = grouped or self.can_group
+            schedules = self.create_solver(courses, group).iter_solutions()
+            if group and not grouped:
+                schedules = expand_schedules(schedules)
+            return schedules if return_generator else list(schedules)
+        if grouped:
+            raise ValueError("Grouped schedules need the native backend")
+
         self.p.reset()
         self.create_variables(courses)
         self.create_constraints(courses)
@@ -110,10 +215,80 @@ class Scheduler(object):
             return self.p.iter_solutions()
         return self.p.get_solutions()
 
+    def page_schedules(self, courses=None, limit=10, cursor=None):
+        """Returns a page of at most limit schedules, in the same order as find_schedules,
+        and the cursor of the next page (None after the last page). Only for the native
+        backend.
+
+        ``cursor``: The opaque cursor string returned with the previous page, or None for the
+            first page. The search resumes where the cursor points without redoing earlier
+            work, so it can be used in a later process. A ValueError is raised if the cursor
+            came from a different query, including one whose sections have changed since.
+        """
+        if self.backend != 'native':
+            raise ValueError("Paging schedules needs the native backend")
+        solver = self.create_solver(courses, self.can_group)
+        digest = self._query_digest(solver)
+        start = ()
+        if cursor is not None:
+            try:
+                cursor_digest, start = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+                start = tuple(int(i) for i in start)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid cursor %r" % (cursor,))
+            if cursor_digest != digest:
+                raise ValueError("Cursor %r is for a different query" % (cursor,))
+
+        schedules = []
+        for path, schedule in self._iter_paths(solver, start):
+            if len(schedules) == limit:
+                token = json.dumps([digest, path]).encode('ascii')
+                return schedules, base64.urlsafe_b64encode(token).decode('ascii')
+            schedules.append(schedule)
+        return schedules, None
+
+    def count_schedules(self, courses=None):
+        """Returns the number of possible course combinations, without creating them.
+        """
+        if self.backend == 'native':
+            return self.create_solver(courses).count_solutions()
+        return sum(1 for schedule in self.find_schedules(courses, return_generator=True))
+
+    def find_schedules_parallel(self, courses=None, processes=None, ordered=True):
+        """Returns a generator of all the possible course combinations, computed by a pool
+        of worker processes. Only for the native backend.
+
+        ``processes``: The number of worker processes. Defaults to the number of CPUs.
+        ``ordered``: If True, schedules come in the same order as find_schedules. Otherwise
+            they come as soon as they are found, which keeps all the workers busy.
+        """
+        if self.backend != 'native':
+            raise ValueError("Parallel schedules need the native backend")
+        schedules = iter_parallel_solutions(self.create_solver(courses, self.can_group), processes, ordered)
+        return expand_schedules(schedules) if self.can_group else schedules
+
+    def best_schedules(self, courses=None, k=10, score=None):
+        """Returns the k best course combinations, best first. Assumes no duplicate courses.
+
+        ``score``: callable that takes the sections of a schedule and returns a number,
+            lower being better. See rpi_courses.scoring for the available scores and how
+            to provide bounds that prune the search. Defaults to GapMinutes().
+        """
+        if score is None:
+            score = GapMinutes()
+        if self.backend == 'native':
+            return self.create_solver(courses).best_solutions(k, score)
+        schedules = self.find_schedules(courses, return_generator=True)
+        return heapq.nsmallest(k, schedules, key=lambda schedule: score(tuple(schedule.values())))
+
     # internal methods -- can be overriden for custom use.
     def get_sections(self, course):
-        """Internal use. Returns the sections to use for the solver for a given course.
+        """Internal use. Returns the sections (or SectionGroups, if linked_sections) to use
+        for the solver for a given course.
         """
+        if self.linked_sections:
+            groups = course.section_groups
+            return [g for g in groups if g.seats_left > 0] if self.free_sections_only else groups
         return course.available_sections if self.free_sections_only else course.sections
 
     def time_conflict(self, schedule):
@@ -127,14 +302,118 @@ class Scheduler(object):
                 return False
         return True
 
+    def _iter_paths(self, solver, start):
+        """Internal use. Returns a generator of (path, schedule) pairs of the given solver,
+        beginning at start. Grouped solvers append the position of each picked section in
+        its EquivalentSections to the path of the search.
+        """
+        depth = len(solver.variables)
+        search_start = start[:depth]
+        for path, schedule in solver.iter_paths(search_start):
+            if not self.can_group:
+                yield path, schedule
+                continue
+            sizes = [len(schedule[course]) for course in solver.variables]
+            for members in _positions(sizes, start[depth:] if path == search_start else ()):
+                yield path + members, dict(
+                    (course, schedule[course].sections[i])
+                    for course, i in zip(solver.variables, members)
+                )
+
+    def _query_digest(self, solver):
+        "Internal use. Returns a short digest of the courses and sections of the given solver."
+        domains = [
+            (course.digest, [digest for value in values for digest in _section_digests(value)])
+            for course, values in solver.domains
+        ]
+        return hashlib.blake2b(repr(domains).encode('utf-8'), digest_size=8).hexdigest()
+
+    def reduce_domains(self, courses):
+        """Returns the sections each course can use before any search is done, as a list of
+        (course, sections), and the pruning stats as a list of dicts with the keys 'course',
+        'total', 'unavailable', 'excluded_times', 'filtered' and 'remaining'.
+
+        Sections are dropped when they have no seats left (if free_sections_only), overlap
+        an excluded time (time_conflict returns False) or fail an added filter. As soon as
+        a course has no sections left there can't be any schedule, so the remaining courses
+        are skipped and the returned domains end with that empty one. If given a dict of
+        {course: sections}, will use the provided sections.
+        """
+        has_sections = isinstance(courses, dict)
+        excluded = 0
+        for timerange in self._excluded_times:
+            excluded |= timerange.occupancy
+        # a subclass's time_conflict decides on its own, otherwise one mask test is enough
+        overridden = type(self).time_conflict is not Scheduler.time_conflict
+        domains, stats = [], []
+        for course in courses:
+            if has_sections:
+                sections = total = courses.get(course, [])
+            else:
+                sections = self.get_sections(course)
+                total = course.section_groups if self.linked_sections else course.sections
+            stat = dict(course=course, total=len(total), unavailable=len(total) - len(sections))
+
+            count = len(sections)
+            if overridden:
+                sections = [s for s in sections if self.time_conflict(s)]
+            elif excluded:
+                sections = [s for s in sections if not s.occupancy & excluded]
+            stat['excluded_times'] = count - len(sections)
+
+            count = len(sections)
+            for predicate in self._filters:
+                sections = [s for s in sections if predicate(s)]
+            stat['filtered'] = count - len(sections)
+
+            stat['remaining'] = len(sections)
+            domains.append((course, sections))
+            stats.append(stat)
+            if not sections:
+                break
+        return domains, stats
+
+    def create_domains(self, courses):
+        """Internal use. Returns the reduced domains of the given courses and keeps their
+        pruning stats in ``pruning_stats``.
+        """
+        domains, self.pruning_stats = self.reduce_domains(courses)
+        return domains
+
+    @property
+    def can_group(self):
+        """Internal use. True if sections that meet at the same times are interchangeable,
+        which is the case for the default constraint that only compares occupancies.
+        """
+        return self.section_constraint is section_constraint
+
+    def group_sections(self, sections):
+        """Internal use. Returns the given sections as a list of EquivalentSections, in the
+        order each group first appears. Sections are only grouped if can_group is True.
+        """
+        key = operator.attrgetter('occupancy') if self.can_group else id
+        groups = {}
+        for section in sections:
+            groups.setdefault(key(section), []).append(section)
+        return [EquivalentSections(group) for group in groups.values()]
+
+    def create_solver(self, courses, grouped=False):
+        """Internal use. Creates the native solver instance for the given courses. If
+        grouped, the solver picks EquivalentSections instead of sections.
+        """
+        domains = self.create_domains(courses)
+        if grouped:
+            domains = [(course, self.group_sections(sections)) for course, sections in domains]
+        mask = operator.attrgetter('occupancy') if self.can_group else None
+        return SectionSolver(domains, self.section_constraint, mask)
+
     def create_variables(self, courses):
         """Internal use. Creates all variables in the problem instance for the given
-        courses. If given a dict of {course: sections}, will use the provided sections.
+        courses, with their reduced domains.
         """
-        has_sections = isinstance(courses, dict)
+        domains = dict(self.create_domains(courses))
         for course in courses:
-            # Python 3 dict.get() is fine
-            self.p.add_variable(course, courses.get(course, []) if has_sections else self.get_sections(course))
+            self.p.add_variable(course, domains.get(course, []))
 
     def create_constraints(self, courses):
         """Internal use. Creates all constraints in the problem instance for the given
@@ -145,13 +424,19 @@ class Scheduler(object):
                 if i <= j:
                     continue
                 self.p.add_constraint(self.section_constraint, [course1, course2])
-            self.p.add_constraint(self.time_conflict, [course1])
 
 
-def compute_schedules(courses=None, excluded_times=(), free_sections_only=True, problem=None, return_generator=False, section_constraint=None):
+def compute_schedules(courses=None, excluded_times=(), free_sections_only=True, problem=None, return_generator=False, section_constraint=None, backend=None, processes=None, linked_sections=False):
     """
     Returns all possible schedules for the given courses.
+
+    If ``processes`` is given, the schedules are computed by that many worker processes
+    (0 for the number of CPUs) with the native solver. A ValueError is raised if another
+    backend or a problem instance is given with it.
     """
-    s = Scheduler(free_sections_only, problem, constraint=section_constraint)
+    s = Scheduler(free_sections_only, problem, constraint=section_constraint, backend=backend, linked_sections=linked_sections)
     s.exclude_times(*tuple(excluded_times))
+    if processes is not None:
+        schedules = s.find_schedules_parallel(courses, processes or None)
+        return schedules if return_generator else list(schedules)
     return s.find_schedules(courses, return_generator)
\ No newline at end of file
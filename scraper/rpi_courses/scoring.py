@@ -0,0 +1,161 @@
+"""scoring.py - Ways to rank schedules for Scheduler.best_schedules.
+
+A score is a callable that takes the sections of a complete schedule and returns
+a number, where lower is better. Scores can also provide ``bound(sections, remaining)``,
+which returns a lower bound on the score of any schedule that contains the given
+sections plus one value from each of the ``remaining`` collections of sections.
+The bound must never be higher than the real score, otherwise good schedules
+will be pruned from the search.
+"""
+from rpi_courses.models import MINUTES_PER_DAY, to_minutes
+
+
+__all__ = ['Score', 'OccupancyScore', 'GapMinutes', 'EarliestStart', 'DaysOnCampus', 'SeatsLeft', 'WeightedScore']
+
+DAY_BITS = (1 << MINUTES_PER_DAY) - 1
+
+
+def _bit_count(n):
+    return bin(n).count('1')
+
+
+def _days(occupancy):
+    "Yields the occupied minutes of each day of the week that has any."
+    day = 0
+    while occupancy:
+        minutes = occupancy & DAY_BITS
+        if minutes:
+            yield day, minutes
+        occupancy >>= MINUTES_PER_DAY
+        day += 1
+
+
+def _span(minutes):
+    "Returns all the minutes from the first to the last occupied minute of a day."
+    first = (minutes & -minutes).bit_length() - 1
+    last = minutes.bit_length() - 1
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+class Score(object):
+    "Base class for scores. Subclasses must implement __call__."
+    def __call__(self, sections):
+        raise NotImplementedError
+
+    def bound(self, sections, remaining):
+        "Returns a lower bound of the score. Defaults to no bound at all."
+        return float('-inf')
+
+
+class OccupancyScore(Score):
+    """Base class for scores that only depend on which minutes of the week are taken.
+
+    Subclasses implement ``score_occupancy(occupancy)``. If adding classes can never lower
+    the score, the default bound is already admissible. Otherwise, override
+    ``bound_occupancy(certain, possible)``, where ``certain`` is taken in every completion
+    and ``possible`` is everything that could be taken.
+    """
+    def __call__(self, sections):
+        occupancy = 0
+        for section in sections:
+            occupancy |= section.occupancy
+        return self.score_occupancy(occupancy)
+
+    def score_occupancy(self, occupancy):
+        raise NotImplementedError
+
+    def bound_occupancy(self, certain, possible):
+        return self.score_occupancy(certain)
+
+    def bound(self, sections, remaining):
+        certain = 0
+        for section in sections:
+            certain |= section.occupancy
+        possible = certain
+        for values in remaining:
+            common = -1
+            for value in values:
+                occupancy = value.occupancy
+                common &= occupancy
+                possible |= occupancy
+            certain |= common
+        return self.bound_occupancy(certain, possible)
+
+
+class GapMinutes(OccupancyScore):
+    "Total minutes between classes on the same day."
+    def score_occupancy(self, occupancy):
+        total = 0
+        for day, minutes in _days(occupancy):
+            gaps = _span(minutes) & ~minutes
+            # bits mark whole minutes of class, so each gap is one minute longer than its bits
+            total += _bit_count(gaps) + _bit_count(gaps & ~(gaps << 1))
+        return total
+
+    def bound_occupancy(self, certain, possible):
+        total = 0
+        for day, minutes in _days(certain):
+            # only minutes that some remaining section could still take can be filled
+            free = possible >> (day * MINUTES_PER_DAY)
+            total += _bit_count(_span(minutes) & ~minutes & ~free)
+        return total
+
+
+class EarliestStart(OccupancyScore):
+    """Total minutes that each day's classes start before ``before``, a military
+    integer time (e.g. - 1000 to avoid 8am classes).
+    """
+    def __init__(self, before=1000):
+        self.before = to_minutes(before)
+
+    def score_occupancy(self, occupancy):
+        total = 0
+        for day, minutes in _days(occupancy):
+            first = (minutes & -minutes).bit_length() - 1
+            total += max(0, self.before - first)
+        return total
+
+
+class DaysOnCampus(OccupancyScore):
+    "The number of days of the week that have any classes."
+    def score_occupancy(self, occupancy):
+        return sum(1 for day in _days(occupancy))
+
+
+class SeatsLeft(Score):
+    "Prefers sections with more open seats. Scores are the negated total of seats left."
+    def __call__(self, sections):
+        return -sum(max(0, s.seats_left) for s in sections)
+
+    def bound(self, sections, remaining):
+        best = sum(max(0, s.seats_left) for s in sections)
+        for values in remaining:
+            best += max(max(0, v.seats_left) for v in values)
+        return -best
+
+
+class WeightedScore(Score):
+    """Combines other scores as a weighted sum.
+
+    ``terms``: (weight, score) pairs. Weights must not be negative to keep the bound
+               admissible.
+    """
+    def __init__(self, *terms):
+        for weight, score in terms:
+            if weight < 0:
+                raise ValueError("Negative weight %r for %r" % (weight, score))
+        self.terms = terms
+
+    def __call__(self, sections):
+        return sum(weight * score(sections) for weight, score in self.terms)
+
+    def bound(self, sections, remaining):
+        total = 0
+        for weight, score in self.terms:
+            if not weight:
+                continue
+            bound = getattr(score, 'bound', None)
+            if bound is None:
+                return float('-inf')
+            total += weight * bound(sections, remaining)
+        return total
@@ -0,0 +1,415 @@
+"""search.py - Indexes for searching courses as the user types.
+
+TrigramIndex answers the case-insensitive substring queries of
+CourseCatalog.find_courses without scanning every course name: every three
+character piece of a text points to the texts that contain it, so a query only
+has to check the texts that contain all of its pieces.
+
+PrefixIndex completes course codes and names: a trie where every node keeps
+its best few courses, so the top completions of a prefix are ready as soon as
+the prefix has been walked.
+
+FuzzyIndex finds courses despite typos in their code or title. Codes and title
+words are indexed by the strings left after deleting a few of their characters,
+so a query only computes the edit distance to the terms that share one of those
+with it instead of to every course.
+"""
+import heapq
+import re
+
+
+__all__ = ['TrigramIndex', 'PrefixIndex', 'FuzzyIndex', 'DeletionIndex', 'course_weight', 'levenshtein']
+
+RE_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _trigrams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class TrigramIndex(object):
+    """A case-insensitive substring index over (text, value) pairs.
+
+    ``items``: (text, value) pairs. Results keep their order, and a value given for
+               several texts is only returned once.
+    """
+    def __init__(self, items):
+        self.texts = []
+        self.values = []
+        self._postings = {}
+        for text, value in items:
+            doc = len(self.texts)
+            text = text.lower()
+            self.texts.append(text)
+            self.values.append(value)
+            for gram in _trigrams(text):
+                self._postings.setdefault(gram, []).append(doc)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query, limit=None):
+        """Returns the values whose text contains the query, in the order they were given.
+
+        ``limit``: The most values to return. Defaults to all of them.
+        """
+        query = query.lower()
+        results, seen = [], set()
+        for doc in self._candidates(query):
+            if limit is not None and len(results) >= limit:
+                break
+            value = self.values[doc]
+            if query in self.texts[doc] and id(value) not in seen:
+                seen.add(id(value))
+                results.append(value)
+        return results
+
+    # internal methods
+
+    def _candidates(self, query):
+        "Internal use. Returns the docs that contain every trigram of the query, in order."
+        grams = _trigrams(query)
+        if not grams:
+            # too short to have a trigram, every text has to be checked
+            return range(len(self.texts))
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        docs = set(postings[0])
+        for posting in postings[1:]:
+            docs.intersection_update(posting)
+            if not docs:
+                return ()
+        return sorted(docs)
+
+
+def course_weight(course):
+    """The default weight of PrefixIndex: the number of students in all the sections of
+    the course. Ties go to lower level courses.
+    """
+    taken = sum(max(0, s.seats_taken or 0) for s in getattr(course, 'sections', ()))
+    num = getattr(course, 'num', 0)
+    return (taken, -num if isinstance(num, int) else 0)
+
+
+def _rank(weight):
+    "Turns a weight into a value that sorts the highest weights first."
+    if isinstance(weight, tuple):
+        return tuple(-w for w in weight)
+    return -weight
+
+
+class _Node(object):
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children = {}
+        # {key: rank} of the terms that end at this node
+        self.entries = {}
+        # the best (rank, key) pairs of this node and everything below it
+        self.top = ()
+
+
+class PrefixIndex(object):
+    """Autocompletion of course codes and names, ranked by weight.
+
+    ``courses``: {key: course} of the courses to complete, like CourseCatalog.courses.
+    ``weight``: callable(course) that returns how high a course ranks, as a number or a
+                tuple of numbers. Defaults to course_weight.
+    ``k``: How many completions every node keeps. complete() only has to walk the prefix
+           when asking for at most k of them.
+    """
+    def __init__(self, courses=None, weight=None, k=10):
+        self.weight = weight or course_weight
+        self.k = k
+        self.courses = {}
+        self._ranks = {}
+        self._root = _Node()
+        for key, course in (courses or {}).items():
+            self._insert(key, course)
+        self._rank_tree(self._root)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def __contains__(self, key):
+        return key in self.courses
+
+    def complete(self, prefix, limit=10):
+        """Returns the courses with a code or name that starts with the given prefix, highest
+        weight first and then by key. This is case-insensitive.
+        """
+        node = self._find(_normalize(prefix))
+        if node is None:
+            return []
+        if limit <= self.k:
+            ranked = node.top[:limit]
+        else:
+            ranked = sorted((rank, key) for key, rank in self._collect(node, {}).items())[:limit]
+        return [self.courses[key] for rank, key in ranked]
+
+    def add(self, key, course):
+        "Adds a course, or replaces the one with the same key."
+        if key in self.courses:
+            self.remove(key)
+        for term in self._insert(key, course):
+            self._rank_path(term)
+
+    def remove(self, key):
+        "Removes the course with the given key."
+        course = self.courses.pop(key)
+        del self._ranks[key]
+        for term in self._terms(key, course):
+            self._find(term).entries.pop(key, None)
+            self._rank_path(term)
+
+    def update(self, courses):
+        """Brings the index up to date with the given {key: course}, after the catalog was
+        refreshed. Only the courses that were added, removed or changed, including changes of
+        their weight, are indexed again. Returns how many there were.
+        """
+        changed = 0
+        for key in [k for k in self.courses if k not in courses]:
+            self.remove(key)
+            changed += 1
+        for key, course in courses.items():
+            old = self.courses.get(key)
+            if old is None or old != course or self._ranks[key] != _rank(self.weight(course)):
+                self.add(key, course)
+                changed += 1
+        return changed
+
+    # internal methods
+
+    def _terms(self, key, course):
+        "Internal use. Returns the texts a course can be completed from."
+        terms = set()
+        for text in (getattr(course, 'code', None), getattr(course, 'name', None)):
+            if text:
+                terms.add(_normalize(str(text)))
+        return terms or set([_normalize(key)])
+
+    def _insert(self, key, course):
+        "Internal use. Adds the terms of a course without ranking them. Returns the terms."
+        self.courses[key] = course
+        rank = self._ranks[key] = _rank(self.weight(course))
+        terms = self._terms(key, course)
+        for term in terms:
+            node = self._root
+            for char in term:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _Node()
+                node = child
+            node.entries[key] = rank
+        return terms
+
+    def _find(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _best(self, node):
+        "Internal use. Returns the k best (rank, key) pairs of the node and its children."
+        candidates = dict(node.entries)
+        for child in node.children.values():
+            for rank, key in child.top:
+                if key not in candidates or rank < candidates[key]:
+                    candidates[key] = rank
+        return tuple(heapq.nsmallest(self.k, ((rank, key) for key, rank in candidates.items())))
+
+    def _rank_tree(self, node):
+        "Internal use. Ranks every node of a subtree, children first."
+        for child in node.children.values():
+            self._rank_tree(child)
+        node.top = self._best(node)
+
+    def _rank_path(self, term):
+        """Internal use. Ranks the nodes along a term again after it was added or removed,
+        dropping the nodes that don't lead to any term anymore.
+        """
+        path = [self._root]
+        for char in term:
+            path.append(path[-1].children[char])
+        for i in range(len(term), 0, -1):
+            node = path[i]
+            if not node.entries and not node.children:
+                del path[i - 1].children[term[i - 1]]
+            else:
+                node.top = self._best(node)
+        self._root.top = self._best(self._root)
+
+    def _collect(self, node, found):
+        "Internal use. Returns {key: rank} of every term under the node."
+        for key, rank in node.entries.items():
+            if key not in found or rank < found[key]:
+                found[key] = rank
+        for child in node.children.values():
+            self._collect(child, found)
+        return found
+
+
+def levenshtein(a, b):
+    "Returns the number of inserted, deleted or replaced characters to turn a into b."
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def _deletions(term, distance):
+    "Returns the term with every combination of up to distance characters deleted."
+    found = set([term])
+    layer = found
+    for i in range(distance):
+        layer = set(t[:j] + t[j + 1:] for t in layer for j in range(len(t)))
+        found |= layer
+    return found
+
+
+class DeletionIndex(object):
+    """Finds the terms within an edit distance of a query (symmetric delete).
+
+    Every term is stored under each string left after deleting up to max_distance of its
+    characters. Two strings within that distance have such a deletion in common, so a
+    query only looks up its own deletions and checks the few terms found under them.
+    """
+    def __init__(self, terms=(), max_distance=2):
+        self.max_distance = max_distance
+        self.terms = []
+        self._ids = {}
+        self._deletions = {}
+        for term in terms:
+            self.add(term)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self._ids
+
+    def add(self, term):
+        "Adds a term. Adding a term that's already in the index does nothing."
+        if term in self._ids:
+            return
+        term_id = self._ids[term] = len(self.terms)
+        self.terms.append(term)
+        for deletion in _deletions(term, self.max_distance):
+            ids = self._deletions.get(deletion)
+            if ids is None:
+                self._deletions[deletion] = term_id
+            elif isinstance(ids, int):
+                # most deletions only come from a single term
+                self._deletions[deletion] = [ids, term_id]
+            else:
+                ids.append(term_id)
+
+    def search(self, term, max_distance=None):
+        "Returns (distance, term) for every term within max_distance, closest first."
+        if max_distance is None:
+            max_distance = self.max_distance
+        elif max_distance > self.max_distance:
+            raise ValueError("Index was built for distances up to %d" % self.max_distance)
+        candidates = set()
+        for deletion in _deletions(term, max_distance):
+            ids = self._deletions.get(deletion)
+            if ids is None:
+                continue
+            if isinstance(ids, int):
+                candidates.add(ids)
+            else:
+                candidates.update(ids)
+        found = []
+        for term_id in candidates:
+            candidate = self.terms[term_id]
+            if abs(len(candidate) - len(term)) > max_distance:
+                continue
+            distance = levenshtein(term, candidate)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        found.sort()
+        return found
+
+
+class FuzzyIndex(object):
+    """Typo-tolerant lookup of courses by code (e.g. - 'CISC 1100') or by title words
+    (e.g. - 'Data Structers').
+
+    ``courses``: {key: course} of the courses to look up, like CourseCatalog.courses.
+    ``weight``: callable(course) that breaks ties between courses at the same distance, as
+                in PrefixIndex. Defaults to course_weight.
+    ``max_distance``: The largest distance lookup() can be asked for.
+    """
+    def __init__(self, courses, weight=None, max_distance=2):
+        self.weight = weight or course_weight
+        self.courses = dict(courses)
+        self._codes = DeletionIndex(max_distance=max_distance)
+        self._words = DeletionIndex(max_distance=max_distance)
+        # term: set of keys of the courses that have it
+        self._code_keys, self._word_keys = {}, {}
+        for key, course in self.courses.items():
+            code = getattr(course, 'code', None)
+            if code:
+                code = _normalize(str(code))
+                self._codes.add(code)
+                self._code_keys.setdefault(code, set()).add(key)
+            text = ' '.join(str(t) for t in (getattr(course, 'name', None), code) if t) or key
+            for word in set(RE_WORD.findall(text.lower())):
+                self._words.add(word)
+                self._word_keys.setdefault(word, set()).add(key)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def lookup(self, query, max_distance=2, limit=10):
+        """Returns (distance, course) pairs of the courses that match the query, closest
+        first and then by weight.
+
+        A course matches if its code is within max_distance of the query, or if every word of
+        the query is close to a word of its title or code. Each word may be off by a third of
+        its length, up to max_distance, and the distance is the total of all words.
+        """
+        distances = {}
+        for distance, code in self._codes.search(_normalize(query), max_distance):
+            for key in self._code_keys[code]:
+                distances.setdefault(key, distance)
+
+        totals = None
+        for word in RE_WORD.findall(query.lower()):
+            best = {}
+            for distance, term in self._words.search(word, min(max_distance, len(word) // 3)):
+                for key in self._word_keys[term]:
+                    best.setdefault(key, distance)
+            if totals is None:
+                totals = best
+            else:
+                totals = dict((key, totals[key] + d) for key, d in best.items() if key in totals)
+            if not totals:
+                break
+        for key, distance in (totals or {}).items():
+            if distance < distances.get(key, distance + 1):
+                distances[key] = distance
+
+        ranked = sorted(
+            (distance, _rank(self.weight(self.courses[key])), key)
+            for key, distance in distances.items()
+        )
+        return [(distance, self.courses[key]) for distance, rank, key in ranked[:limit]]
@@ -0,0 +1,170 @@
+"""session.py - Keeps the schedules of a course cart up to date while it's edited.
+
+Schedules are built one course at a time. The session keeps the schedules of
+every prefix of its courses, so adding a course only extends the last ones and
+removing a course only rebuilds from the prefix before it.
+"""
+import itertools
+
+from rpi_courses.scheduler import Scheduler
+
+
+__all__ = ['ScheduleSession']
+
+
+class ScheduleSession(object):
+    """A stateful set of courses and all of their possible schedules.
+
+    ``courses``: The initial courses.
+    ``scheduler``: The scheduler whose settings are used: free_sections_only, excluded
+                   times, filters and section constraint. Defaults to Scheduler(). Call
+                   rebuild() after changing its settings.
+    """
+    def __init__(self, courses=(), scheduler=None):
+        self.scheduler = scheduler or Scheduler()
+        self._courses = []
+        self._domains = []
+        # _levels[i] holds the schedules of the first i courses as (occupancy, values)
+        self._levels = [[(0, ())]]
+        for course in courses:
+            self.add_course(course)
+
+    def __repr__(self):
+        return "<ScheduleSession: courses={courses!r} schedules={count}>".format(
+            courses=[str(c) for c in self._courses],
+            count=len(self),
+        )
+
+    def __contains__(self, course):
+        return course in self._courses
+
+    def __len__(self):
+        return self.count_schedules()
+
+    @property
+    def courses(self):
+        return tuple(self._courses)
+
+    def add_course(self, course):
+        "Adds a course and extends the current schedules with its sections."
+        if course in self._courses:
+            return self
+        domains = self.scheduler.reduce_domains([course])[0]
+        self._courses.append(course)
+        self._domains.append(self.scheduler.group_sections(domains[0][1]))
+        self._levels.append(self._extend(self._levels[-1], self._domains[-1]))
+        return self
+
+    def remove_course(self, course):
+        """Removes a course. The schedules of the courses added before it are kept and
+        only the courses added after it are scheduled again.
+        """
+        index = self._courses.index(course)
+        del self._courses[index]
+        del self._domains[index]
+        del self._levels[index + 1:]
+        for values in self._domains[index:]:
+            self._levels.append(self._extend(self._levels[-1], values))
+        return self
+
+    def rebuild(self):
+        "Schedules all the courses again, for when the scheduler's settings have changed."
+        courses = self._courses
+        self._courses, self._domains, self._levels = [], [], [[(0, ())]]
+        for course in courses:
+            self.add_course(course)
+        return self
+
+    def update_sections(self, sections):
+        """Updates the schedules after the seats of the given sections changed, such as
+        the sections returned by CourseCatalog.update_seats. Only the schedules with a
+        section that can't be used anymore are dropped, and only the schedules with the
+        sections that can be used again are searched for.
+        """
+        crns = set(s.crn for s in sections)
+        for index, course in enumerate(self._courses):
+            if any(s.crn in crns for s in course.sections):
+                self._update_course(index)
+        return self
+
+    def iter_schedules(self, grouped=False):
+        """Returns a generator of all the schedules as {course: section} dicts.
+
+        ``grouped``: If True, each course is mapped to the EquivalentSections that were
+            picked for it instead of a single section.
+        """
+        for occupancy, values in self._levels[-1]:
+            if grouped:
+                yield dict(zip(self._courses, values))
+            else:
+                yield from self._expand(values)
+
+    def get_schedules(self, grouped=False):
+        "Returns a list of all the schedules. See iter_schedules."
+        return list(self.iter_schedules(grouped))
+
+    def count_schedules(self):
+        "Returns the number of schedules without creating them."
+        total = 0
+        for occupancy, values in self._levels[-1]:
+            count = 1
+            for group in values:
+                count *= len(group)
+            total += count
+        return total
+
+    # internal methods
+
+    def _group_key(self, group):
+        if self.scheduler.can_group:
+            return group.occupancy
+        return id(group.sections[0])
+
+    def _update_course(self, index):
+        course = self._courses[index]
+        course.clear_cache()
+        domains = self.scheduler.reduce_domains([course])[0]
+        groups = self.scheduler.group_sections(domains[0][1])
+        by_key = dict((self._group_key(g), g) for g in groups)
+        old_keys = set(self._group_key(g) for g in self._domains[index])
+        # every old group is replaced by the new one with the same times, if any
+        replace = dict((id(g), by_key.get(self._group_key(g))) for g in self._domains[index])
+        added = [g for g in groups if self._group_key(g) not in old_keys]
+        self._domains[index] = groups
+
+        for depth in range(index + 1, len(self._levels)):
+            level = []
+            for occupancy, values in self._levels[depth]:
+                group = replace[id(values[index])]
+                if group is not None:
+                    level.append((occupancy, values[:index] + (group,) + values[index + 1:]))
+            self._levels[depth] = level
+
+        if added:
+            extension = self._extend(self._levels[index], added)
+            self._levels[index + 1].extend(extension)
+            for depth in range(index + 1, len(self._domains)):
+                extension = self._extend(extension, self._domains[depth])
+                self._levels[depth + 1].extend(extension)
+
+    def _expand(self, values):
+        for sections in itertools.product(*(group.sections for group in values)):
+            yield dict(zip(self._courses, sections))
+
+    def _extend(self, level, values):
+        "Returns the schedules of the given level extended with each compatible value."
+        if self.scheduler.can_group:
+            masks = [(value.occupancy, value) for value in values]
+            return [
+                (occupancy | mask, partial + (value,))
+                for occupancy, partial in level
+                for mask, value in masks
+                if not occupancy & mask
+            ]
+        compatible = self.scheduler.section_constraint
+        return [
+            (occupancy, partial + (value,))
+            for occupancy, partial in level
+            for value in values
+            if all(compatible(other.sections[0], value.sections[0]) for other in partial)
+        ]
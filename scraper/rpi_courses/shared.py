@@ -0,0 +1,557 @@
+"""shared.py - A read-only catalog file that many processes can memory-map at once.
+
+write_catalog() saves the courses, sections and periods of a parsed catalog as
+fixed size records. SharedCatalog maps that file read-only, so the OS page cache
+keeps one copy of it for every worker, and hands out small accessors that act
+like Course, Section and Period but only decode the fields that are used.
+
+File layout (little-endian): the header, then the string offsets and bytes,
+the period, section and course records, the period and note references of the
+sections, the (crn, section) index sorted by crn and the JSON metadata.
+Courses are sorted by their key in the catalog and the sections of a course
+are next to each other.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from rpi_courses.models import Course, Period, Section, DAY_MAPPER, link_sections, merge_days, minute_mask, _stable_hash
+
+
+__all__ = ['write_catalog', 'open_catalog', 'SharedCatalog', 'SharedCourse', 'SharedSection', 'SharedPeriod']
+
+MAGIC = b'RPIC'
+VERSION = 1
+
+HEADER = struct.Struct('<4sH15I')
+PERIOD = struct.Struct('<16sIIIhhI')
+SECTION = struct.Struct('<16sIBqIiiIHIH')
+COURSE = struct.Struct('<16sIIIBqhhIIH')
+REF = struct.Struct('<I')
+CRN = struct.Struct('<qI')
+
+# values that are an int when they can be, like CRNs and course numbers
+INT, STR = 0, 1
+NO_TIME = -1
+
+
+class _Strings(object):
+    "Internal use. Assigns an id to every distinct string that's written."
+    def __init__(self):
+        self.ids = {}
+
+    def __call__(self, string):
+        return self.ids.setdefault(string, len(self.ids))
+
+    def scalar(self, value):
+        "Returns (kind, value) for an int, or (kind, string id) for anything else."
+        if isinstance(value, int):
+            return INT, value
+        return STR, self(str(value))
+
+
+def write_catalog(catalog, path):
+    """Writes the courses of the given catalog into a file for SharedCatalog.
+
+    ``catalog``: A CourseCatalog or anything with a ``courses`` dict of {key: Course}.
+    ``path``: Where to write. The file is replaced atomically, so processes that already
+              mapped the old file keep reading it until they open the new one.
+    """
+    strings = _Strings()
+    periods, period_ids = [], {}
+    sections, period_refs, note_refs, crns = [], [], [], []
+    courses = []
+    for key in sorted(catalog.courses):
+        course = catalog.courses[key]
+        first_section = len(sections)
+        for section in course.sections:
+            first_period = len(period_refs)
+            for period in section.periods:
+                if period.digest not in period_ids:
+                    period_ids[period.digest] = len(periods)
+                    periods.append(PERIOD.pack(
+                        period.digest, strings(period.type), strings(period.instructor),
+                        strings(period.location),
+                        NO_TIME if period.start is None else period.start,
+                        NO_TIME if period.end is None else period.end,
+                        # as a string of digits, since the order is part of a period
+                        strings(''.join(map(str, period.int_days))),
+                    ))
+                period_refs.append(REF.pack(period_ids[period.digest]))
+            first_note = len(note_refs)
+            note_refs.extend(REF.pack(strings(note)) for note in section.notes)
+            kind, crn = strings.scalar(section.crn)
+            if kind == INT:
+                crns.append((crn, len(sections)))
+            sections.append(SECTION.pack(
+                section.digest, len(courses), kind, crn, strings(section.num),
+                section.seats_taken, section.seats_total,
+                first_period, len(section.periods), first_note, len(section.notes),
+            ))
+        kind, num = strings.scalar(course.num)
+        courses.append(COURSE.pack(
+            course.digest, strings(key), strings(course.name), strings(course.dept),
+            kind, num, course.cred[0], course.cred[1], strings(course.grade_type),
+            first_section, len(course.sections),
+        ))
+    crns.sort()
+
+    metadata = {}
+    for name in ('name', 'semester', 'year', 'month', 'timestamp', 'url'):
+        if getattr(catalog, name, None) is not None:
+            metadata[name] = getattr(catalog, name)
+
+    blob = [s.encode('utf-8') for s in strings.ids]
+    offsets, total = [], 0
+    for data in blob:
+        offsets.append(REF.pack(total))
+        total += len(data)
+    offsets.append(REF.pack(total))
+
+    parts = [
+        b''.join(offsets), b''.join(blob), b''.join(periods), b''.join(sections),
+        b''.join(courses), b''.join(period_refs), b''.join(note_refs),
+        b''.join(CRN.pack(crn, index) for crn, index in crns),
+        json.dumps(metadata).encode('utf-8'),
+    ]
+    starts, position = [], HEADER.size
+    for part in parts:
+        starts.append(position)
+        position += len(part)
+    header = HEADER.pack(
+        MAGIC, VERSION, len(strings.ids), len(periods), len(sections), len(courses), len(crns),
+        *(starts + [len(parts[-1])])
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header)
+        for part in parts:
+            f.write(part)
+    os.replace(tmp_path, path)
+    return path
+
+
+_open_catalogs = {}
+
+
+def _file_source(stat):
+    "Internal use. Identifies a version of a file, which write_catalog always replaces."
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def open_catalog(path):
+    """Returns the SharedCatalog of the given file, opening it only once per process, or
+    again once write_catalog has replaced the file. Unpickled accessors use it, so sending
+    them to worker processes is cheap. Catalogs that were already returned keep reading
+    the file they mapped.
+    """
+    path = os.path.abspath(path)
+    catalog = _open_catalogs.get(path)
+    if catalog is None or catalog._source != _file_source(os.stat(path)):
+        catalog = _open_catalogs[path] = SharedCatalog(path)
+    return catalog
+
+
+class SharedCatalog(object):
+    """A memory-mapped catalog file written by write_catalog.
+
+    Acts like the read-only parts of CourseCatalog. ``courses`` is a mapping of the
+    same keys to SharedCourse accessors, and the name, semester, year, month and
+    timestamp of the catalog are attributes when they were saved.
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(self.path, 'rb') as f:
+            self._source = _file_source(os.fstat(f.fileno()))
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = HEADER.unpack_from(self._buffer, 0)
+        if fields[0] != MAGIC or fields[1] != VERSION:
+            self._buffer.close()
+            raise ValueError("%r is not a version %d catalog file" % (path, VERSION))
+        (self._string_count, self._period_count, self._section_count,
+         self._course_count, self._crn_count) = fields[2:7]
+        (self._offsets, self._strings, self._periods, self._sections, self._courses,
+         self._period_refs, self._note_refs, self._crns, meta_start, meta_size) = fields[7:17]
+        self.__dict__.update(json.loads(self._buffer[meta_start:meta_start + meta_size]))
+        self.courses = SharedCourses(self)
+
+    def __repr__(self):
+        return "<SharedCatalog: %r courses=%d>" % (self.path, self._course_count)
+
+    def __reduce__(self):
+        return (open_catalog, (self.path,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        "Unmaps the file. Accessors of this catalog can't be used afterwards."
+        if _open_catalogs.get(self.path) is self:
+            del _open_catalogs[self.path]
+        self._buffer.close()
+
+    def get_courses(self):
+        "Returns all the courses of this catalog."
+        return [SharedCourse(self, i) for i in range(self._course_count)]
+
+    def find_section_by_crn(self, crn):
+        "Returns the section with the given CRN, or None if not found."
+        if not isinstance(crn, int):
+            # like the catalog's crn_index, which is keyed by int CRNs
+            return None
+        low, high = 0, self._crn_count
+        while low < high:
+            middle = (low + high) // 2
+            value, index = CRN.unpack_from(self._buffer, self._crns + middle * CRN.size)
+            if value == crn:
+                return SharedSection(self, index)
+            if value < crn:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def find_course_by_crn(self, crn):
+        "Returns the course with a section of the given CRN, or None if not found."
+        section = self.find_section_by_crn(crn)
+        return section and section.course
+
+    # internal methods
+
+    def _string(self, index):
+        start, end = struct.unpack_from('<II', self._buffer, self._offsets + index * REF.size)
+        return self._buffer[self._strings + start:self._strings + end].decode('utf-8')
+
+    def _scalar(self, kind, value):
+        return value if kind == INT else self._string(value)
+
+    def _refs(self, table, first, count):
+        return struct.unpack_from('<%dI' % count, self._buffer, table + first * REF.size)
+
+    def _course_key(self, index):
+        return self._string(COURSE.unpack_from(self._buffer, self._courses + index * COURSE.size)[1])
+
+    def _find_course(self, key):
+        "Returns the index of the course with the given key, or None."
+        low, high = 0, self._course_count
+        while low < high:
+            middle = (low + high) // 2
+            value = self._course_key(middle)
+            if value == key:
+                return middle
+            if value < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+
+class SharedCourses(object):
+    "The {key: SharedCourse} mapping of a SharedCatalog. Keys are looked up by binary search."
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __len__(self):
+        return self._catalog._course_count
+
+    def __iter__(self):
+        return (self._catalog._course_key(i) for i in range(len(self)))
+
+    def __contains__(self, key):
+        return self._catalog._find_course(key) is not None
+
+    def __getitem__(self, key):
+        index = self._catalog._find_course(key)
+        if index is None:
+            raise KeyError(key)
+        return SharedCourse(self._catalog, index)
+
+    def get(self, key, default=None):
+        index = self._catalog._find_course(key)
+        return default if index is None else SharedCourse(self._catalog, index)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return self._catalog.get_courses()
+
+    def items(self):
+        return list(zip(self.keys(), self.values()))
+
+
+class SharedRecord(object):
+    """Base class of the accessors. Holds only the catalog and the position of the record,
+    and compares and hashes like the model it was written from.
+    """
+    __slots__ = ('_catalog', '_index')
+    RECORD = None
+
+    def __init__(self, catalog, index):
+        self._catalog, self._index = catalog, index
+
+    def __eq__(self, other):
+        return self.digest == getattr(other, 'digest', None)
+
+    def __hash__(self):
+        return _stable_hash(self.digest)
+
+    def __reduce__(self):
+        return (self.__class__, (self._catalog, self._index))
+
+    @property
+    def digest(self):
+        return self._record()[0]
+
+    @property
+    def hexdigest(self):
+        return self.digest.hex()
+
+    # internal methods
+
+    def _record(self):
+        return self.RECORD.unpack_from(self._catalog._buffer, self._table() + self._index * self.RECORD.size)
+
+    def _table(self):
+        raise NotImplementedError
+
+
+class SharedPeriod(SharedRecord):
+    "Acts like a Period whose fields are read from a SharedCatalog."
+    __slots__ = ('_masks',)
+    RECORD = PERIOD
+
+    def __repr__(self):
+        return "<SharedPeriod: start=%r end=%r days=%r>" % (self.start, self.end, self.days)
+
+    @property
+    def type(self):
+        return self._catalog._string(self._record()[1])
+
+    @property
+    def instructor(self):
+        return self._catalog._string(self._record()[2])
+
+    @property
+    def location(self):
+        return self._catalog._string(self._record()[3])
+
+    @property
+    def start(self):
+        start = self._record()[4]
+        return None if start == NO_TIME else start
+
+    @property
+    def end(self):
+        end = self._record()[5]
+        return None if end == NO_TIME else end
+
+    @property
+    def int_days(self):
+        return tuple(map(int, self._catalog._string(self._record()[6])))
+
+    @property
+    def days(self):
+        return tuple(map(DAY_MAPPER.get, self.int_days))
+
+    @property
+    def minute_mask(self):
+        return self._cached_masks()[1]
+
+    @property
+    def day_bits(self):
+        return self._cached_masks()[0]
+
+    _minute_mask = minute_mask
+    _day_bits = day_bits
+
+    # the rest only depends on the fields above
+    day_masks = Period.day_masks
+    occupancy = Period.occupancy
+    time_range = Period.time_range
+    start_time = Period.start_time
+    end_time = Period.end_time
+    tba = Period.tba
+    is_lecture = Period.is_lecture
+    is_studio = Period.is_studio
+    is_lab = Period.is_lab
+    is_testing_period = Period.is_testing_period
+    is_recitation = Period.is_recitation
+    conflicts_with = Period.conflicts_with
+
+    def to_model(self):
+        "Returns this period as a Period instance."
+        return Period(self.type, self.instructor, str(self.start), str(self.end),
+                      self.location, self.int_days)
+
+    def _cached_masks(self):
+        "Internal use. Returns (day_bits, minute_mask), decoded once per accessor."
+        try:
+            return self._masks
+        except AttributeError:
+            minutes = minute_mask(self.start, self.end)
+            bits = 0
+            if minutes:
+                for day in self.int_days:
+                    bits |= 1 << day
+            self._masks = (bits, minutes)
+            return self._masks
+
+    def _table(self):
+        return self._catalog._periods
+
+
+class SharedSection(SharedRecord):
+    """Acts like a Section whose fields are read from a SharedCatalog. The seat counts are
+    the ones when the file was written.
+    """
+    __slots__ = ('_masks',)
+    RECORD = SECTION
+
+    def __repr__(self):
+        return "<SharedSection: crn={crn!r} num={num!r} seats={used!r}/{total!r}>".format(
+            crn=self.crn, num=self.num, used=self.seats_taken, total=self.seats_total,
+        )
+
+    @property
+    def course(self):
+        return SharedCourse(self._catalog, self._record()[1])
+
+    @property
+    def crn(self):
+        record = self._record()
+        return self._catalog._scalar(record[2], record[3])
+
+    @property
+    def num(self):
+        return self._catalog._string(self._record()[4])
+
+    @property
+    def seats_taken(self):
+        return self._record()[5]
+
+    @property
+    def seats_total(self):
+        return self._record()[6]
+
+    @property
+    def periods(self):
+        record = self._record()
+        refs = self._catalog._refs(self._catalog._period_refs, record[7], record[8])
+        return tuple(SharedPeriod(self._catalog, i) for i in refs)
+
+    @property
+    def notes(self):
+        record = self._record()
+        refs = self._catalog._refs(self._catalog._note_refs, record[9], record[10])
+        return tuple(self._catalog._string(i) for i in refs)
+
+    @property
+    def day_bits(self):
+        return self._days()[0]
+
+    @property
+    def day_masks(self):
+        return self._days()[1]
+
+    _day_bits = day_bits
+    _day_masks = day_masks
+
+    occupancy = Section.occupancy
+    component = Section.component
+    is_study_abroad = Section.is_study_abroad
+    is_off_campus = Section.is_off_campus
+    is_valid = Section.is_valid
+    is_filled = Section.is_filled
+    seats_left = Section.seats_left
+    conflicts_with = Section.conflicts_with
+
+    def to_model(self):
+        "Returns this section as a Section instance."
+        return Section(self.crn, self.num, self.seats_taken, self.seats_total,
+                       [p.to_model() for p in self.periods], self.notes)
+
+    def _days(self):
+        "Internal use. Returns (day_bits, day_masks), decoded once per accessor."
+        try:
+            return self._masks
+        except AttributeError:
+            self._masks = merge_days((p.day_bits, p.day_masks) for p in self.periods)
+            return self._masks
+
+    def _table(self):
+        return self._catalog._sections
+
+
+class SharedCourse(SharedRecord):
+    "Acts like a Course whose fields are read from a SharedCatalog."
+    __slots__ = ('_groups',)
+    RECORD = COURSE
+
+    def __repr__(self):
+        return "<SharedCourse: {name!r}, {dept!r}, {num!r}, section_count={count}>".format(
+            name=self.name, dept=self.dept, num=self.num, count=self._record()[10],
+        )
+
+    def __contains__(self, crn):
+        return any(section.crn == crn for section in self.sections)
+
+    __str__ = Course.__str__
+
+    @property
+    def name(self):
+        return self._catalog._string(self._record()[2])
+
+    @property
+    def dept(self):
+        return self._catalog._string(self._record()[3])
+
+    @property
+    def num(self):
+        record = self._record()
+        return self._catalog._scalar(record[4], record[5])
+
+    @property
+    def cred(self):
+        return self._record()[6:8]
+
+    @property
+    def grade_type(self):
+        return self._catalog._string(self._record()[8])
+
+    @property
+    def sections(self):
+        record = self._record()
+        return tuple(SharedSection(self._catalog, i) for i in range(record[9], record[9] + record[10]))
+
+    @property
+    def available_sections(self):
+        return tuple(s for s in self.sections if s.seats_left > 0)
+
+    @property
+    def section_groups(self):
+        try:
+            return self._groups
+        except AttributeError:
+            self._groups = link_sections(self.sections)
+            return self._groups
+
+    full_dept = Course.full_dept
+    credits = Course.credits
+    is_pass_or_fail = Course.is_pass_or_fail
+    code = Course.code
+
+    def to_model(self):
+        "Returns this course as a Course instance."
+        return Course(self.name, self.dept, self.num, self.cred[0], self.cred[1],
+                      self.grade_type, [s.to_model() for s in self.sections])
+
+    def _table(self):
+        return self._catalog._courses
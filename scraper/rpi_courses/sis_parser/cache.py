@@ -0,0 +1,106 @@
+"""cache.py - Snapshots of parsed course catalogs.
+
+Parsing a semester file with BeautifulSoup takes seconds, so the finished
+catalog is pickled into config.CACHE_DIR. Snapshots are keyed by the source html, its
+url and PARSER_VERSION, so a changed file or parser never loads a stale one.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+from rpi_courses import config
+from rpi_courses.config import logger
+
+
+__all__ = ['PARSER_VERSION', 'snapshot_hasher', 'snapshot_key', 'load_snapshot', 'save_snapshot', 'clear_snapshots']
+
+# bump this whenever the features or models change what a parsed catalog holds
+PARSER_VERSION = 1
+
+SUFFIX = '.catalog.pickle'
+
+
+def _path(key, cache_dir):
+    return os.path.join(cache_dir, key + SUFFIX)
+
+
+def snapshot_hasher(url=None):
+    """Returns a hashlib object to update with the source bytes as they're read. Its
+    hexdigest() is the same as snapshot_key of the whole source.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(('%d\n%s\n' % (PARSER_VERSION, url or '')).encode('utf-8'))
+    return digest
+
+
+def snapshot_key(source, url=None):
+    "Returns the key of the snapshot of a catalog parsed from the given source str or bytes."
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    digest = snapshot_hasher(url)
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def load_snapshot(key, cache_dir=None):
+    """Returns the attributes of the catalog saved under the given key as a dict, or None
+    if there isn't a usable snapshot.
+    """
+    cache_dir = cache_dir or config.CACHE_DIR
+    if not cache_dir:
+        return None
+    path = _path(key, cache_dir)
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # an unreadable snapshot is just a miss, parse again and overwrite it
+        logger.warning('Ignoring broken catalog snapshot %s: %s' % (path, e))
+        return None
+
+
+def save_snapshot(key, catalog, cache_dir=None):
+    """Saves the attributes of the given catalog under the given key. Returns the path of
+    the snapshot, or None if it couldn't be written.
+    """
+    cache_dir = cache_dir or config.CACHE_DIR
+    if not cache_dir:
+        return None
+    path = _path(key, cache_dir)
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to a temporary file first, so readers never see half a snapshot
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(vars(catalog), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        tmp_path = None
+    except Exception as e:
+        # the catalog was parsed fine, not being able to save it (e.g. - an attribute
+        # that can't be pickled) only means it's parsed again next time
+        logger.warning('Could not save catalog snapshot %s: %s' % (path, e))
+        return None
+    finally:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return path
+
+
+def clear_snapshots(cache_dir=None):
+    "Deletes all the saved snapshots. Returns how many were deleted."
+    cache_dir = cache_dir or config.CACHE_DIR
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return 0
+    count = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith(SUFFIX):
+            os.remove(os.path.join(cache_dir, name))
+            count += 1
+    return count
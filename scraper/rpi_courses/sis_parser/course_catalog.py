@@ -7,8 +7,13 @@ import datetime
 import urllib.request as urllib_request
 
 from rpi_courses.web import get
+from rpi_courses.config import logger
+from rpi_courses.columns import PeriodColumns
+from rpi_courses.search import TrigramIndex, PrefixIndex, FuzzyIndex
 # Assuming 'features' is accessible, but Python 3 requires the dot (e.g., '.features') if it's relative
 from .features import * # Assuming this file is part of a package structure
+from .cache import snapshot_hasher, snapshot_key, load_snapshot, save_snapshot
+from .stream import parse_stream, read_chunks
 
 import re
 
@@ -37,35 +42,83 @@ class CourseCatalog(object):
         Pass nothing to initiate an empty course catalog.
         """
         self.url = url
+        self._search_index = None
+        self._prefix_index = None
+        self._fuzzy_index = None
         if soup is not None:
             self.parse(soup)
 
     @staticmethod
-    def from_string(html_str, url=None):
-        "Creates a new CourseCatalog instance from an string containing html."
-        # CRITICAL CHANGE 2: BeautifulSoup.HTML_ENTITIES is removed in BS4.
-        # We specify the 'html.parser' or 'lxml' parser for HTML content.
-        # html_str must be a string (bytes must be decoded first).
-        return CourseCatalog(BeautifulSoup(_remove_divs(html_str), 'html.parser'), url)
+    def from_string(html_str, url=None, use_cache=True, streaming=False):
+        """Creates a new CourseCatalog instance from an string containing html.
+
+        ``use_cache``: If True, loads the catalog from the snapshot saved the last time the
+                       same html was parsed, or saves one after parsing. See cache.py.
+        ``streaming``: If True, reads the html with stream.SISPageParser instead of building
+                       a BeautifulSoup tree of it.
+        """
+        key = snapshot_key(html_str, url) if use_cache else None
+        state = load_snapshot(key) if key else None
+        if state is not None:
+            return CourseCatalog._from_snapshot(state, url)
+        if streaming:
+            catalog = CourseCatalog(parse_stream([html_str]), url)
+        else:
+            # CRITICAL CHANGE 2: BeautifulSoup.HTML_ENTITIES is removed in BS4.
+            # We specify the 'html.parser' or 'lxml' parser for HTML content.
+            # html_str must be a string (bytes must be decoded first).
+            catalog = CourseCatalog(BeautifulSoup(_remove_divs(html_str), 'html.parser'), url)
+        if key:
+            save_snapshot(key, catalog)
+        return catalog
 
     @staticmethod
-    def from_stream(stream, url=None):
-        "Creates a new CourseCatalog instance from a filehandle-like stream."
+    def from_stream(stream, url=None, use_cache=True, streaming=False):
+        """Creates a new CourseCatalog instance from a filehandle-like stream.
+
+        ``streaming``: If True, parses the stream while reading it in chunks, so the whole
+                       html is never in memory. The snapshot cache is only written to then,
+                       since the key isn't known before the end of the stream.
+        """
+        if streaming:
+            hasher = snapshot_hasher(url) if use_cache else None
+            catalog = CourseCatalog(parse_stream(read_chunks(stream), hasher), url)
+            if hasher is not None:
+                save_snapshot(hasher.hexdigest(), catalog)
+            return catalog
         # CRITICAL CHANGE 3: stream.read() returns bytes in Python 3; must decode to str.
-        return CourseCatalog.from_string(stream.read().decode('utf-8'), url)
+        html_str = stream.read()
+        if isinstance(html_str, bytes):
+            html_str = html_str.decode('utf-8')
+        return CourseCatalog.from_string(html_str, url, use_cache)
 
     @staticmethod
-    def from_file(filepath):
+    def from_file(filepath, use_cache=True, streaming=False):
         "Creates a new CourseCatalog instance from a local filepath."
-        # Recommended: Specify encoding and reading mode for text files
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return CourseCatalog.from_stream(f, filepath)
+        if streaming and use_cache:
+            # hash the file first, it's much cheaper than parsing it when there's a snapshot
+            hasher = snapshot_hasher(filepath)
+            with open(filepath, 'rb') as f:
+                for chunk in read_chunks(f):
+                    hasher.update(chunk)
+            state = load_snapshot(hasher.hexdigest())
+            if state is not None:
+                return CourseCatalog._from_snapshot(state, filepath)
+        with open(filepath, 'rb') as f:
+            return CourseCatalog.from_stream(f, filepath, use_cache, streaming)
 
     @staticmethod
-    def from_url(url):
-        "Creates a new CourseCatalog instance from a given url."
+    def from_url(url, use_cache=True, streaming=False):
+        "Creates a new CourseCatalog instance from a given url. See from_string."
         # 'get(url)' must return a decoded string in Python 3 'web.py'
-        catalog = CourseCatalog.from_string(get(url), url)
+        catalog = CourseCatalog.from_string(get(url), url, use_cache, streaming)
+        return catalog
+
+    @staticmethod
+    def _from_snapshot(state, url):
+        catalog = CourseCatalog(url=url)
+        catalog.__dict__.update(state)
+        logger.info('Loaded catalog %s from its snapshot' % catalog.name)
         return catalog
 
     def parse(self, soup):
@@ -77,13 +130,93 @@ class CourseCatalog(object):
         """Returns all the CRN courses crosslisted with the given crn.
         The returned crosslisting does not include the original CRN.
         """
-        # NOTE: The original function raises NotImplemented, but the logic below is P3 compatible
-        # raise NotImplemented # Keep if function is not meant to be used
-        return tuple([c for c in self.crosslistings[crn].crns if c != crn])
+        # crosslisting_feature is disabled, so parsed catalogs have no crosslistings
+        crosslisting = (getattr(self, 'crosslistings', None) or {}).get(crn)
+        if crosslisting is None:
+            return ()
+        return tuple([c for c in crosslisting.crns if c != crn])
+
+    def find_courses(self, partial, limit=None):
+        """Finds all courses by a given substring of their name and code, in the order of
+        their names. This is case-insensitive.
+
+        ``limit``: The most courses to return. Defaults to all of them.
+        """
+        if self._search_index is None:
+            # built on first use, the courses don't change afterwards
+            self._search_index = TrigramIndex((key, self.courses[key]) for key in sorted(self.courses))
+        return self._search_index.search(partial, limit)
+
+    def complete(self, prefix, limit=10):
+        """Returns the courses whose code or name starts with the given prefix, for
+        autocompletion. The courses with the most students come first.
+        """
+        if self._prefix_index is None:
+            self._prefix_index = PrefixIndex(self.courses)
+        return self._prefix_index.complete(prefix, limit)
+
+    def find_similar_courses(self, query, max_distance=2, limit=10):
+        """Finds courses by a code or title that may have typos (e.g. - 'CISC 1100'). Returns
+        the closest matches first, see FuzzyIndex.lookup.
+        """
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self.courses)
+        return [course for distance, course in self._fuzzy_index.lookup(query, max_distance, limit)]
+
+    def get_courses(self):
+        """Returns all course objects from this catalog.
+        """
+        return list(self.courses.values())
+
+    def to_columns(self):
+        """Returns a PeriodColumns with all the periods of this catalog, for vectorized
+        queries. Requires numpy.
+        """
+        return PeriodColumns(self.get_courses())
+
+    def find_course_by_crn(self, crn):
+        """Returns the course with a section of the given CRN, or None if not found.
+        """
+        return self.crn_index.get(crn, (None, None))[0]
+
+    def find_section_by_crn(self, crn):
+        """Returns the section with the given CRN, or None if not found.
+        """
+        return self.crn_index.get(crn, (None, None))[1]
+
+    def find_course(self, partial, fuzzy=False):
+        """Returns the first course that matches the given substring, or None.
+
+        ``fuzzy``: If True and no course matches, returns the closest one from
+                   find_similar_courses instead.
+        """
+        courses = self.find_courses(partial, limit=1)
+        if not courses and fuzzy:
+            courses = self.find_similar_courses(partial, limit=1)
+        return courses[0] if courses else None
+
+    def update_seats(self, seats):
+        """Applies refreshed seat counts to the sections of this catalog.
+
+        ``seats``: {crn: taken} or {crn: (taken, total)}. Unknown CRNs are ignored.
 
-    def find_courses(self, partial):
-        """Finds all courses by a given substring. This is case-insensitive.
+        Returns a tuple of (filled, opened) tuples of the sections that ran out of seats
+        and the sections that got seats again, to pass on to any ScheduleSession.
         """
-        partial = partial.lower()
-        # dict.keys() returns a view in P3, which is fine
-        keys = self.courses.keys
\ No newline at end of file
+        filled, opened = [], []
+        for crn, counts in seats.items():
+            course, section = self.crn_index.get(crn, (None, None))
+            if course is None:
+                continue
+            taken, total = counts if isinstance(counts, tuple) else (counts, None)
+            was_available = section.seats_left > 0
+            section.update_seats(taken, total)
+            course.clear_cache()
+            if self._prefix_index is not None:
+                # the number of students ranks the completions
+                self._prefix_index.add(str(course), course)
+            if was_available and section.seats_left <= 0:
+                filled.append(section)
+            elif not was_available and section.seats_left > 0:
+                opened.append(section)
+        return tuple(filled), tuple(opened)
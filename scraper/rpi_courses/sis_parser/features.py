@@ -6,6 +6,7 @@ function name with '_feature'
 """
 import datetime
 import re
+import sys
 # CRITICAL CHANGE 1: Python 3 requires explicit imports for utils
 # Assuming the necessary modules are installed and correctly configured in rpi_courses.*
 from rpi_courses.utils import FrozenDict, safeInt
@@ -68,34 +69,99 @@ def course_feature(catalog, soup):
     """
     courses = {}
     count = 0
+    interner = Interner()
+    # pages read by the streaming parser already turned their rows into dicts
+    parsed = soup.courses if isinstance(soup, StreamedPage) else parse_tables(soup)
     # Python 3 iteration over generators/lists works fine
-    for course_data in parse_tables(soup):
-        c = create_course(course_data)
+    for course_data in parsed:
+        c = create_course(course_data, interner)
         count += 1
         # str() conversion is valid in P3
         courses[str(c)] = c
     catalog.courses = FrozenDict(courses)
+    catalog.crn_index = FrozenDict(
+        (section.crn, (course, section)) for course in courses.values() for section in course.sections
+    )
+    catalog.intern_stats = interner.stats()
     logger.info('Catalog has %d courses (manual: %d)' % (len(courses), count))
+    logger.info('Interning shared %(strings_shared)d strings and %(periods_shared)d periods, '
+                'saving about %(bytes_saved)d bytes' % catalog.intern_stats)
 
 
 # INTERNAL FUNCTIONS
 
 
-def create_period(period_data):
+class Interner(object):
+    """Hands out one shared instance for equal strings and equal periods while parsing.
+
+    The same instructors, locations and class times are repeated by thousands of rows,
+    and periods are immutable, so every section can point to the same objects. Keeps
+    count of the duplicates that were dropped and roughly how many bytes they held.
+    """
+    def __init__(self):
+        self._strings = {}
+        self._periods = {}
+        self.strings_shared = self.periods_shared = self.bytes_saved = 0
+
+    def string(self, value):
+        "Returns the shared copy of the given string."
+        shared = self._strings.setdefault(value, value)
+        if shared is not value:
+            self.strings_shared += 1
+            self.bytes_saved += sys.getsizeof(value)
+        return shared
+
+    def period(self, period_data):
+        "Returns the shared Period for the given period data."
+        data = dict(period_data)
+        for name in ('type', 'instructor', 'location'):
+            # the models strip these anyway
+            data[name] = self.string(data[name].strip())
+        key = (data['type'], data['instructor'], data['location'],
+               str(data['start']), str(data['end']), tuple(data['int_days']))
+        period = self._periods.get(key)
+        if period is None:
+            period = self._periods[key] = Period(**data)
+        else:
+            self.periods_shared += 1
+            self.bytes_saved += sys.getsizeof(period) + sys.getsizeof(period.int_days)
+        return period
+
+    def stats(self):
+        "Returns the counts of unique and shared objects as a dict."
+        return {
+            'strings': len(self._strings),
+            'strings_shared': self.strings_shared,
+            'periods': len(self._periods),
+            'periods_shared': self.periods_shared,
+            'bytes_saved': self.bytes_saved,
+        }
+
+
+def create_period(period_data, interner=None):
+    if interner is not None:
+        return interner.period(period_data)
     return Period(**period_data)
 
 
-def create_section(section_data):
+def create_section(section_data, interner=None):
     data = dict(section_data)
     # Python 3 tuple comprehension is valid
-    data['periods'] = tuple(create_period(p) for p in section_data['periods'])
+    data['periods'] = tuple(create_period(p, interner) for p in section_data['periods'])
+    if interner is not None:
+        data['num'] = interner.string(data['num'])
+        data['notes'] = [interner.string(n) for n in data['notes']]
     return Section(**data)
 
 
-def create_course(course_data):
+def create_course(course_data, interner=None):
     data = dict(course_data)
     # Python 3 tuple comprehension is valid
-    data['sections'] = tuple(create_section(s) for s in course_data['sections'])
+    data['sections'] = tuple(create_section(s, interner) for s in course_data['sections'])
+    if interner is not None:
+        for name in ('name', 'dept', 'grade_type'):
+            if name in data:
+                data[name] = interner.string(data[name].strip())
     return Course(**data)
 
 
@@ -150,53 +216,94 @@ def extract_period(cells, period, G):
     period['location'] = node.text.strip() if node else ''
 
 
-def parse_tables(node):
-    courses = []
-    cache = {}
-    last_course = last_section = last_period = None
-    # Python 3 iteration is valid
-    rows = node.findAll('tr')
+class TextNode(object):
+    "An html element reduced to its text, which is all the features read from the page."
+    __slots__ = ('text',)
 
-    # Python 3 list initialization is valid
-    columns = [None] * len(rows[0].findAll('th'))
+    def __init__(self, text):
+        self.text = text
 
-    # Python 3 iteration is valid
-    for i, row in enumerate(rows[0].findAll('th')):
-        columns[i] = row.text.strip()
 
+class StreamedPage(object):
+    """Stands in for the BeautifulSoup of a page that was read by stream.SISPageParser.
+
+    Only has what the features use: the title, the h3 elements and the course dicts
+    that were built from the table rows while reading.
+    """
+    def __init__(self, title, headings, courses):
+        self.title = title
+        self.headings = headings
+        self.courses = courses
+
+    def findAll(self, name):
+        if name != 'h3':
+            raise ValueError("Only h3 elements are kept for streamed pages, not %r" % name)
+        return self.headings
+
+
+def parse_tables(node):
+    reader = TableReader()
     # Python 3 iteration is valid
-    for i, row in enumerate(rows[1].findAll('th')):
-        # Python 3 string concatenation is valid
-        columns[i] += ' ' + row.text.strip() if row.text else ''
+    for row in node.findAll('tr'):
+        reader.add_row(row.findAll('th'), row.findAll('td'))
+    return reader.courses
 
-    # Python 3 tuple/generator comprehension is valid
-    columns = tuple(x.strip() for x in columns)
 
-    # CRITICAL CHANGE 3: Python 2 'print columns' is Python 3 'print(columns)'
-    print(columns)
-    # possible choices... (comment unchanged)
+class TableReader(object):
+    """Builds the course dicts from the rows of the SIS table, one row at a time.
 
-    def G(cells, name):
+    The first two rows are the headers that name the columns. Rows are given as their
+    th and td elements, which only need a ``text`` attribute.
+    """
+    def __init__(self):
+        self.courses = []
+        self.columns = None
+        self._rows = 0
+        self._cache = {}
+        self._last_course = self._last_section = self._last_period = None
+
+    def add_row(self, headers, cells):
+        self._rows += 1
+        if self._rows == 1:
+            # Python 3 list initialization is valid
+            self.columns = [None] * len(headers)
+            # Python 3 iteration is valid
+            for i, row in enumerate(headers):
+                self.columns[i] = row.text.strip()
+        elif self._rows == 2:
+            # Python 3 iteration is valid
+            for i, row in enumerate(headers):
+                # Python 3 string concatenation is valid
+                self.columns[i] += ' ' + row.text.strip() if row.text else ''
+            # Python 3 tuple/generator comprehension is valid
+            self.columns = tuple(x.strip() for x in self.columns)
+            logger.debug('Table columns: %r' % (self.columns,))
+            # possible choices... (comment unchanged)
+        else:
+            self._add_cells(cells)
+
+    def column(self, cells, name):
+        "Returns the cell of the given column, or None if the row doesn't have it."
         try:
             # Python 3 indexing and error handling is identical
-            return cells[columns.index(name)]
+            return cells[self.columns.index(name)]
         except (IndexError, ValueError):
             return None
 
-    def cache_key(course_dict):
+    # internal methods
+
+    def _cache_key(self, course_dict):
         # Python 3 string concatenation is valid
         return course_dict['dept'] + course_dict['num']
 
-    # Python 3 iteration is valid
-    for row in rows[2:]:
+    def _add_cells(self, cells):
+        G = self.column
         course = {'sections': []}
         section = {'notes': set(), 'periods': []}
         period = {}
-        # Python 3 iteration is valid
-        cells = row.findAll('td')
         # if we got to a new course / section
         if len(cells) < 2:
-            continue
+            return
         # String comparison and strip() is identical
         elif cells[0].text.strip() != '':
             # <crn> <code>-<num>-<sec>
@@ -207,7 +314,7 @@ def parse_tables(node):
             course['dept'], course['num'], section['num'] = parts[1].split('-', 2)
             # course name
             course['name'] = G(cells, 'Course Title').text.strip()
-            existing_obj = cache.get(cache_key(course))
+            existing_obj = self._cache.get(self._cache_key(course))
             if existing_obj:
                 course = existing_obj
 
@@ -243,25 +350,23 @@ def parse_tables(node):
             # link up
             section['periods'].append(period)
             course['sections'].append(section)
-            cache[cache_key(course)] = course
+            self._cache[self._cache_key(course)] = course
 
             if not existing_obj:
-                courses.append(course)
+                self.courses.append(course)
 
-            last_course, last_section, last_period = course, section, period
+            self._last_course, self._last_section, self._last_period = course, section, period
 
         # String comparison is identical
         elif 'NOTE:' in cells[1].text.strip():  # process note
-            course, section = last_course, last_section
+            section = self._last_section
             # set.add() and strip() is identical
             section['notes'].add(cells[2].text.strip())
 
         # Dictionary copy is valid
         else:  # process a new period type
-            course, section = last_course, last_section
+            section = self._last_section
 
-            period = last_period.copy()
+            period = self._last_period.copy()
             extract_period(cells, period, G)
             section['periods'].append(period)
-
-    return courses
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""stream.py - Reads the SIS course listing without building a document tree.
+
+SISPageParser hands every table row to a TableReader as soon as the row ends,
+so only the course dicts are kept in memory instead of the whole html and its
+BeautifulSoup tree. It keeps the title and h3 elements for the other features.
+The result is the same as parsing the page with BeautifulSoup, as long as the
+page closes its table cells and rows like the SIS pages do.
+"""
+import codecs
+from html.parser import HTMLParser
+
+from .features import StreamedPage, TableReader, TextNode
+
+
+__all__ = ['SISPageParser', 'parse_stream', 'read_chunks']
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SISPageParser(HTMLParser):
+    """Feed it the html in pieces, then call close() and use ``page``, a StreamedPage
+    that the features can parse like a BeautifulSoup.
+    """
+    # text is only collected inside these elements
+    CAPTURED = ('title', 'h3')
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.reader = TableReader()
+        self.title = None
+        self.headings = []
+        self._captures = []
+        self._row = None
+        self._cell = None
+
+    @property
+    def page(self):
+        return StreamedPage(self.title, self.headings, self.reader.courses)
+
+    def close(self):
+        super().close()
+        self._end_row()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self._end_row()
+            self._row = ([], [])
+        elif tag in ('td', 'th') and self._row is not None:
+            self._end_cell()
+            self._cell = (tag, [])
+        elif tag in self.CAPTURED:
+            self._captures.append((tag, []))
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th'):
+            self._end_cell()
+        elif tag in ('tr', 'table'):
+            self._end_row()
+        elif self._captures and self._captures[-1][0] == tag:
+            tag, text = self._captures.pop()
+            node = TextNode(''.join(text))
+            if tag == 'title':
+                # like soup.title, only the first one counts
+                self.title = self.title or node
+            else:
+                self.headings.append(node)
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell[1].append(data)
+        for tag, text in self._captures:
+            text.append(data)
+
+    # internal methods
+
+    def _end_cell(self):
+        if self._cell is not None:
+            tag, text = self._cell
+            self._row[0 if tag == 'th' else 1].append(TextNode(''.join(text)))
+            self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self._row is not None:
+            self.reader.add_row(*self._row)
+            self._row = None
+
+
+def read_chunks(stream, size=CHUNK_SIZE):
+    "Yields the contents of a file-like stream in pieces of the given size."
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_stream(chunks, hasher=None):
+    """Parses an iterable of str or bytes (utf-8) pieces of the page. Returns a
+    StreamedPage.
+
+    ``hasher``: Optional hashlib object that is updated with the bytes of every piece, to
+                compute a cache key while reading.
+    """
+    parser = SISPageParser()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            if hasher is not None:
+                hasher.update(chunk)
+            chunk = decoder.decode(chunk)
+        elif hasher is not None:
+            hasher.update(chunk.encode('utf-8'))
+        parser.feed(chunk)
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return parser.page
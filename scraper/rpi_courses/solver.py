@@ -0,0 +1,255 @@
+"""solver.py - A constraint solver specialized for picking course sections.
+
+Every variable (a course) must be assigned exactly one value (a section) and
+the only binary constraint is that no two chosen values are incompatible.
+That lets the search prune much harder than a generic constraint solver.
+"""
+import heapq
+import itertools
+
+
+__all__ = ['SectionSolver', 'ConflictCache']
+
+
+class ConflictCache(object):
+    """Memoizes a compatible(value1, value2) callable, so that it can be shared by
+    many solvers whose domains hold the same values.
+
+    ``symmetric``: If True, a result is also stored for the values in reverse order.
+    """
+    def __init__(self, compatible, symmetric=True):
+        self.compatible = compatible
+        self.symmetric = symmetric
+        self.hits = self.misses = 0
+        self._results = {}
+
+    def __call__(self, value1, value2):
+        try:
+            result = self._results[value1, value2]
+        except KeyError:
+            self.misses += 1
+            result = self._results[value1, value2] = self.compatible(value1, value2)
+            if self.symmetric:
+                self._results[value2, value1] = result
+            return result
+        self.hits += 1
+        return result
+
+    def __len__(self):
+        return len(self._results)
+
+    @property
+    def hit_rate(self):
+        "Returns the fraction of calls answered from the cache."
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def clear(self):
+        self.hits = self.misses = 0
+        self._results.clear()
+
+
+class SectionSolver(object):
+    """Backtracking search with minimum-remaining-values (MRV) variable ordering
+    and forward checking.
+
+    ``domains``: sequence of (variable, values) pairs. The order is kept for the
+                 returned solutions and used to break MRV ties.
+    ``compatible``: callable(value1, value2) that returns True if both values can
+                    be part of the same solution.
+    ``mask``: Optional callable(value) that returns an int bitmask, for when two values
+              are compatible exactly when their masks don't intersect. It lets
+              count_solutions memoize its search.
+    """
+    def __init__(self, domains, compatible, mask=None):
+        self.variables = tuple(variable for variable, values in domains)
+        self.domains = tuple((variable, tuple(values)) for variable, values in domains)
+        self.compatible = compatible
+        self.mask = mask
+
+    def iter_solutions(self):
+        "Returns a generator of all solutions as {variable: value} dicts."
+        if any(not values for variable, values in self.domains):
+            return iter(())
+        return self._search({}, self.domains)
+
+    def get_solutions(self):
+        "Returns a list of all solutions as {variable: value} dicts."
+        return list(self.iter_solutions())
+
+    def iter_paths(self, start=()):
+        """Returns a generator of (path, solution) pairs in the same order as iter_solutions.
+        A path is the position of each value picked, in the order the search picks them, and
+        identifies a solution of a given solver.
+
+        ``start``: the path of the first solution to return. Nothing before it is searched.
+        """
+        if any(not values for variable, values in self.domains):
+            return iter(())
+        return self._search_paths({}, self.domains, [], tuple(start))
+
+    def count_solutions(self):
+        "Returns the number of solutions without creating any of them."
+        if any(not values for variable, values in self.domains):
+            return 0
+        if self.mask is None:
+            return self._count(self.domains)
+
+        # values with the same mask are interchangeable, so only count each mask once
+        domains = []
+        for variable, values in sorted(self.domains, key=lambda d: len(d[1])):
+            counts = {}
+            for value in values:
+                m = self.mask(value)
+                counts[m] = counts.get(m, 0) + 1
+            domains.append(tuple(counts.items()))
+        # the bits that any later variable could still run into
+        relevant = [0] * (len(domains) + 1)
+        for i in range(len(domains) - 1, -1, -1):
+            relevant[i] = relevant[i + 1]
+            for m, count in domains[i]:
+                relevant[i] |= m
+        return self._count_masks(domains, relevant, 0, 0, {})
+
+    def split(self):
+        """Returns the variable the search starts with and its values. The solutions of
+        iter_branch(0), iter_branch(1), ... in turn are the same as iter_solutions().
+        """
+        if not self.domains:
+            return None, ()
+        return self.domains[self._select(self.domains)]
+
+    def iter_branch(self, index):
+        """Returns a generator of the solutions where the variable from split() takes
+        its index-th value.
+        """
+        if any(not values for variable, values in self.domains):
+            return iter(())
+        i = self._select(self.domains)
+        variable, values = self.domains[i]
+        pruned = self._forward_check(values[index], self.domains[:i] + self.domains[i + 1:])
+        if pruned is None:
+            return iter(())
+        return self._search({variable: values[index]}, pruned)
+
+    def best_solutions(self, k, score):
+        """Returns the k solutions with the lowest score, best first. Ties keep the
+        order they would be found in by iter_solutions.
+
+        ``score``: callable(values) that scores a complete solution. If it also has a
+                   ``bound(values, remaining)`` method, partial solutions whose bound can't
+                   beat the current k-th best solution are pruned.
+        """
+        if k <= 0 or any(not values for variable, values in self.domains):
+            return []
+        heap = []
+        self._branch_and_bound({}, self.domains, k, score, heap, itertools.count())
+        heap.sort(reverse=True)
+        return [solution for value, order, solution in heap]
+
+    # internal methods
+
+    def _select(self, remaining):
+        """Internal use. Returns the index of the variable with the fewest values left.
+        Ties go to the variable that was given first.
+        """
+        best = 0
+        for i in range(1, len(remaining)):
+            if len(remaining[i][1]) < len(remaining[best][1]):
+                best = i
+        return best
+
+    def _forward_check(self, value, remaining):
+        """Internal use. Returns the remaining domains with every value incompatible
+        with the given one removed, or None if any domain ends up empty.
+        """
+        compatible = self.compatible
+        pruned = []
+        for variable, values in remaining:
+            kept = tuple(v for v in values if compatible(value, v))
+            if not kept:
+                return None
+            pruned.append((variable, kept))
+        return pruned
+
+    def _search(self, assignment, remaining):
+        if not remaining:
+            yield dict((variable, assignment[variable]) for variable in self.variables)
+            return
+        index = self._select(remaining)
+        variable, values = remaining[index]
+        rest = remaining[:index] + remaining[index + 1:]
+        for value in values:
+            pruned = self._forward_check(value, rest)
+            if pruned is None:
+                continue
+            assignment[variable] = value
+            yield from self._search(assignment, pruned)
+            del assignment[variable]
+
+    def _search_paths(self, assignment, remaining, path, start):
+        if not remaining:
+            yield tuple(path), dict((variable, assignment[variable]) for variable in self.variables)
+            return
+        index = self._select(remaining)
+        variable, values = remaining[index]
+        rest = remaining[:index] + remaining[index + 1:]
+        first = start[0] if start else 0
+        for i in range(first, len(values)):
+            pruned = self._forward_check(values[i], rest)
+            if pruned is None:
+                continue
+            assignment[variable] = values[i]
+            path.append(i)
+            yield from self._search_paths(assignment, pruned, path, start[1:] if i == first else ())
+            path.pop()
+            del assignment[variable]
+
+    def _branch_and_bound(self, assignment, remaining, k, score, heap, counter):
+        # heap holds (-score, -order, solution), so heap[0] is the worst solution kept.
+        if not remaining:
+            value = score(tuple(assignment.values()))
+            entry = (-value, -next(counter), dict((v, assignment[v]) for v in self.variables))
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif value < -heap[0][0]:
+                heapq.heapreplace(heap, entry)
+            return
+        bound = getattr(score, 'bound', None)
+        index = self._select(remaining)
+        variable, values = remaining[index]
+        rest = remaining[:index] + remaining[index + 1:]
+        for value in values:
+            pruned = self._forward_check(value, rest)
+            if pruned is None:
+                continue
+            assignment[variable] = value
+            if bound is None or len(heap) < k or \
+                    bound(tuple(assignment.values()), [v for _, v in pruned]) < -heap[0][0]:
+                self._branch_and_bound(assignment, pruned, k, score, heap, counter)
+            del assignment[variable]
+
+    def _count(self, remaining):
+        if not remaining:
+            return 1
+        index = self._select(remaining)
+        variable, values = remaining[index]
+        rest = remaining[:index] + remaining[index + 1:]
+        total = 0
+        for value in values:
+            pruned = self._forward_check(value, rest)
+            if pruned is not None:
+                total += self._count(pruned)
+        return total
+
+    def _count_masks(self, domains, relevant, i, used, memo):
+        if i == len(domains):
+            return 1
+        key = (i, used & relevant[i])
+        if key not in memo:
+            total = 0
+            for m, count in domains[i]:
+                if not m & used:
+                    total += count * self._count_masks(domains, relevant, i + 1, used | m, memo)
+            memo[key] = total
+        return memo[key]